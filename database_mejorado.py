@@ -9,100 +9,850 @@ así como los cálculos de tarifas, duración y valores a pagar.
 """
 
 # Importación de módulos necesarios
+import os  # Lectura de variables de entorno
 import sqlite3  # Módulo para trabajar con bases de datos SQLite
 import csv  # Módulo para exportar datos en formato CSV
+import atexit  # Módulo para cerrar la conexión al terminar la aplicación
+import logging  # Registro de errores sin escribir directamente en la consola
+import re  # Expresiones regulares para validar placas
+import itertools  # Herramientas para recorrer iteradores sin crear listas intermedias
+import threading  # Estado por hilo para el modo de registro masivo
+import queue  # Conexiones de solo lectura disponibles para reutilizar
+import shutil  # Búsqueda del programa sqlite3 en el PATH
+import subprocess  # Ejecución del programa sqlite3 para exportaciones rápidas
+from contextlib import contextmanager  # Decorador para crear bloques "with"
+from functools import lru_cache  # Memoria de resultados para fechas repetidas
 from pathlib import Path  # Módulo para manejar rutas de archivos de forma segura
-from datetime import datetime, date, time  # Módulos para manejar fechas y horas
+from datetime import datetime, date  # Módulos para manejar fechas y horas
+
+# Registro de eventos del módulo
+# El formato del mensaje se aplaza hasta que un manejador lo necesita; la
+# aplicación configura los manejadores al arrancar (ver main_mejorado.py)
+log = logging.getLogger("parking.db")
 
 # Definición de constantes
 # Ruta donde se almacena la base de datos, utilizando Path para compatibilidad multiplataforma
-DB_PATH = Path("data/parking.db")
+# Puede cambiarse con la variable de entorno PARQUEADERO_DB; con el valor ':memory:'
+# la base de datos vive solo en memoria (útil para demostraciones y pruebas)
+DB_PATH = Path(os.environ.get("PARQUEADERO_DB", "data/parking.db"))
+
+# Tamaño del buffer de escritura para los archivos exportados (1 MiB)
+# Un buffer grande agrupa muchas filas por cada llamada write() al sistema operativo
+BUFFER_EXPORTACION = 1 << 20
+
+# Filas escritas entre cada aviso de progreso de exportar_historial_csv()
+LOTE_EXPORTACION = 1000
+
+# Páginas copiadas en cada paso de realizar_backup(); entre pasos otras
+# conexiones pueden seguir leyendo y escribiendo en la base de datos
+PAGINAS_POR_PASO_BACKUP = 1024
+
+# Tarifas por defecto: (valor por hora completa, valor por fracción de 15 minutos)
+# Carros: $5000/hora, $1200/fracción
+# Motos: $3500/hora, $900/fracción
+TARIFAS_POR_DEFECTO = {
+    "Carro": (5000, 1200),
+    "Moto": (3500, 900),
+}
+
+# Conexión compartida por todo el módulo
+# Se abre una sola vez por proceso y se reutiliza en cada operación, evitando
+# reabrir el archivo y volver a ejecutar el esquema en cada llamada
+_conn = None
+
+# Evita que dos hilos abran la conexión (y ejecuten el esquema) al mismo tiempo
+_bloqueo_conexion = threading.Lock()
+
+# Serializa las escrituras: la conexión compartida es la única que escribe y
+# solo un hilo a la vez puede tener una transacción abierta en ella
+# (reentrante para que modo_masivo() pueda contener otras operaciones)
+_bloqueo_escritura = threading.RLock()
+
+# Número máximo de conexiones de solo lectura (ver conectar_lectura)
+# En modo WAL las lecturas no bloquean la escritura ni se bloquean entre sí
+LECTORES = 4
+
+# Conexiones de solo lectura libres; LIFO para reutilizar primero la que
+# tiene la caché de páginas más reciente
+_lectores = queue.LifoQueue()
+_lectores_abiertos = 0
+
+# Estado por hilo: indica si hay un bloque modo_masivo() en curso
+_estado_hilo = threading.local()
+
+# Última fecha formateada por obtener_fecha_hora_actual: (ordinal del día, 'YYYY-MM-DD')
+# La fecha solo cambia una vez al día, así que casi siempre se reutiliza el texto
+_ultima_fecha = (None, None)
+
+# Valor de tarifas.dia_semana para las tarifas que aplican todos los días
+# (0=lunes ... 6=domingo son los días específicos)
+DIA_TODOS = 7
+
+# Tarifas ya consultadas: (tipo_vehiculo, dia_semana, hora) -> (tarifa_hora, tarifa_fraccion)
+# Las tarifas casi nunca cambian; después de modificar la tabla tarifas se
+# debe llamar a invalidar_cache_tarifas()
+_cache_tarifas = {}
+
+# Tarifas por tipo cuando la configuración es la trivial (una sola tarifa activa
+# por tipo, para todos los días y todas las horas): tipo_vehiculo -> (tarifa_hora, tarifa_fraccion)
+# En ese caso obtener_tarifa no necesita calcular el día ni consultar nada
+# None si hay tarifas por día u hora (se usa la búsqueda normal)
+_tarifas_simples = None
+
+# Cada cuántas inserciones en historial se recalculan sus estadísticas (ANALYZE)
+UMBRAL_ANALYZE = 1000
+
+# Inserciones en historial desde el último ANALYZE (solo en memoria)
+_inserciones_historial = 0
+
+# Formato de placa: 3 letras seguidas de 3 números (carros), o de 2 números y
+# opcionalmente una letra (motos); compatible con el validador de la interfaz
+# Se compila una sola vez al cargar el módulo
+_PATRON_PLACA = re.compile(r"[A-Z]{3}(?:\d{3}|\d{2}[A-Z]?)")
+
+# Tipos de vehículo admitidos (se validan en Python antes de cada inserción)
+# Asocia el tipo en minúsculas con su forma canónica: una sola búsqueda en el
+# diccionario valida el tipo y retorna la cadena constante, sin crear otra nueva
+_NORMALIZAR_TIPO = {"carro": "Carro", "moto": "Moto"}
+
+# Esquema de la tabla de vehículos activos ({tabla} se reemplaza por el nombre de la tabla)
+# Esta tabla almacena los vehículos que actualmente están en el parqueadero
+# El tipo no lleva restricción CHECK: registrar_ingreso ya lo valida con _NORMALIZAR_TIPO
+# y así SQLite no evalúa la restricción en cada inserción
+_DDL_VEHICULOS = '''
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        placa TEXT PRIMARY KEY,  -- Placa del vehículo como clave primaria
+        fecha_entrada TEXT,      -- Fecha de entrada en formato YYYY-MM-DD
+        hora_entrada INTEGER,    -- Hora de entrada (0-23)
+        minuto_entrada INTEGER,  -- Minuto de entrada (0-59)
+        tipo TEXT,               -- Tipo de vehículo ('Carro' o 'Moto')
+        usuario TEXT             -- Usuario que registró la entrada
+    )
+'''
+
+# Esquema de la tabla de historial ({tabla} se reemplaza por el nombre de la tabla)
+# Esta tabla almacena el registro histórico de todos los vehículos que han usado el parqueadero
+# El id es un INTEGER PRIMARY KEY simple (alias del rowid): es único igual que con
+# AUTOINCREMENT, pero SQLite no tiene que mantener la tabla sqlite_sequence en cada inserción
+# fecha_registro es un entero (epoch): el índice compara enteros de 8 bytes en lugar
+# de cadenas de 19 caracteres al ordenar el historial
+_DDL_HISTORIAL = '''
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        id INTEGER PRIMARY KEY,    -- ID único (alias del rowid)
+        placa TEXT,                -- Placa del vehículo
+        tipo TEXT,                 -- Tipo de vehículo
+        fecha_entrada TEXT,        -- Fecha de entrada en formato YYYY-MM-DD
+        hora_entrada INTEGER,      -- Hora de entrada (0-23)
+        minuto_entrada INTEGER,    -- Minuto de entrada (0-59)
+        fecha_salida TEXT,         -- Fecha de salida en formato YYYY-MM-DD
+        hora_salida INTEGER,       -- Hora de salida (0-23)
+        minuto_salida INTEGER,     -- Minuto de salida (0-59)
+        duracion_horas REAL,       -- Duración en horas (con decimales para fracciones)
+        valor_pagado REAL,         -- Valor pagado
+        usuario_registro TEXT,     -- Usuario que registró la salida
+        fecha_registro INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))  -- Fecha y hora del registro (segundos desde 1970, UTC)
+    )
+'''
+
+# Conversión de fecha_registro al reconstruir historial: las versiones anteriores
+# la guardaban como texto 'YYYY-MM-DD HH:MM:SS'; ahora son segundos enteros
+_CONVERSION_FECHA_REGISTRO = {
+    "fecha_registro": (
+        "CASE WHEN typeof(fecha_registro) = 'text' "
+        "THEN COALESCE(CAST(strftime('%s', fecha_registro) AS INTEGER), 0) "
+        "ELSE COALESCE(fecha_registro, 0) END"
+    )
+}
+
+# Esquema de la tabla de tarifas ({tabla} se reemplaza por el nombre de la tabla)
+# Esta tabla permite configurar diferentes tarifas según tipo de vehículo, día y hora
+# El día es un número (0=lunes ... 6=domingo, 7=todos) para que la búsqueda sea
+# una comparación de enteros sobre el índice
+_DDL_TARIFAS = '''
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,  -- ID único autoincremental
+        tipo_vehiculo TEXT,        -- Tipo de vehículo (Carro o Moto)
+        dia_semana INTEGER,        -- Día de la semana (0=lunes ... 6=domingo) o 7 (todos)
+        hora_inicio INTEGER,       -- Hora de inicio para esta tarifa
+        hora_fin INTEGER,          -- Hora de fin para esta tarifa
+        tarifa_hora REAL,          -- Valor por hora completa
+        tarifa_fraccion REAL,      -- Valor por fracción (15 minutos)
+        activo INTEGER DEFAULT 1   -- Indica si la tarifa está activa (1) o no (0)
+    )
+'''
+
+# Conversión de dia_semana al reconstruir tarifas: las versiones anteriores
+# guardaban el nombre del día ('lunes' ... 'domingo') o 'todos'
+_CONVERSION_DIA_SEMANA = {
+    "dia_semana": (
+        "CASE lower(dia_semana) "
+        "WHEN 'lunes' THEN 0 WHEN 'martes' THEN 1 "
+        "WHEN 'miercoles' THEN 2 WHEN 'miércoles' THEN 2 "
+        "WHEN 'jueves' THEN 3 WHEN 'viernes' THEN 4 "
+        "WHEN 'sabado' THEN 5 WHEN 'sábado' THEN 5 "
+        f"WHEN 'domingo' THEN 6 WHEN 'todos' THEN {DIA_TODOS} "
+        "ELSE dia_semana END"
+    )
+}
+
+# Esquema completo de la base de datos, ejecutado con un solo executescript()
+_ESQUEMA = f'''
+    -- Vehículos activos: los que actualmente están en el parqueadero
+    {_DDL_VEHICULOS.format(tabla="vehiculos")};
+    
+    -- Historial de todos los vehículos que han usado el parqueadero
+    {_DDL_HISTORIAL.format(tabla="historial")};
+    
+    -- Tarifas configurables según tipo de vehículo, día y hora
+    {_DDL_TARIFAS.format(tabla="tarifas")};
+    
+    -- Índice para la búsqueda de la tarifa vigente en obtener_tarifa
+    CREATE INDEX IF NOT EXISTS idx_tarifas_busqueda ON tarifas(tipo_vehiculo, dia_semana, activo, hora_inicio, hora_fin);
+    
+    -- Una sola tarifa por tipo, día y franja horaria (hace idempotente la carga inicial)
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_tarifas_unica ON tarifas(tipo_vehiculo, dia_semana, hora_inicio, hora_fin);
+'''
+
+# Índices del historial. Van aparte de _ESQUEMA porque una tabla historial del
+# formato antiguo no tiene las columnas de fecha: sus índices se crean después
+# de que migrar_datos_antiguos() la convierta
+_ESQUEMA_INDICES_HISTORIAL = '''
+    -- Índice para listar el historial del más reciente al más antiguo sin ordenar toda la tabla;
+    -- incluye el id para desempatar los registros del mismo segundo (reemplaza al
+    -- índice anterior, solo sobre fecha_registro)
+    DROP INDEX IF EXISTS idx_historial_fecha;
+    CREATE INDEX IF NOT EXISTS idx_historial_reciente ON historial(fecha_registro DESC, id DESC);
+    
+    -- Índices para los filtros del historial por fecha de entrada y por tipo + fecha;
+    -- el primero incluye la placa para descartar filas por placa sin leer la tabla
+    -- (reemplaza al índice anterior, solo sobre fecha_entrada)
+    DROP INDEX IF EXISTS idx_historial_fecha_entrada;
+    CREATE INDEX IF NOT EXISTS idx_historial_fecha_placa ON historial(fecha_entrada, placa);
+    CREATE INDEX IF NOT EXISTS idx_historial_tipo_fecha ON historial(tipo, fecha_entrada);
+    
+    -- Índice para buscar placas por prefijo (LIKE no distingue mayúsculas, por eso NOCASE)
+    CREATE INDEX IF NOT EXISTS idx_historial_placa ON historial(placa COLLATE NOCASE);
+'''
+
+# Sentencias SQL de uso frecuente
+# Al usar siempre el mismo objeto de texto, cada sentencia se compila una sola vez
+# y las llamadas siguientes la toman de la caché de sentencias de la conexión
+# La tarifa por defecto de un tipo de vehículo solo se inserta si ese tipo no tiene
+# ninguna tarifa: si el operador ya configuró las suyas (por ejemplo, por franjas
+# horarias), no se agrega otra que se superponga con ellas
+_SQL_INSERTAR_TARIFA = (
+    "INSERT INTO tarifas (tipo_vehiculo, dia_semana, hora_inicio, hora_fin, tarifa_hora, tarifa_fraccion) "
+    "SELECT ?1, ?2, ?3, ?4, ?5, ?6 "
+    "WHERE NOT EXISTS (SELECT 1 FROM tarifas WHERE tipo_vehiculo = ?1)"
+)
+
+# Un día específico (0-6) es menor que DIA_TODOS (7), así que ORDER BY dia_semana
+# prioriza la tarifa del día sobre la tarifa genérica
+_SQL_TARIFA = f"""
+    SELECT tarifa_hora, tarifa_fraccion FROM tarifas 
+    WHERE tipo_vehiculo = ? AND 
+          dia_semana IN (?, {DIA_TODOS}) AND
+          hora_inicio <= ? AND hora_fin >= ? AND
+          activo = 1
+    ORDER BY dia_semana
+    LIMIT 1
+"""
+
+# Si la placa ya existe, ON CONFLICT no inserta nada
+_SQL_INSERTAR_VEHICULO = """
+    INSERT INTO vehiculos (placa, fecha_entrada, hora_entrada, minuto_entrada, tipo, usuario)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(placa) DO NOTHING
+"""
+
+# Retira el vehículo y retorna sus datos de entrada (DELETE ... RETURNING, SQLite 3.35+)
+_SQL_RETIRAR_VEHICULO = """
+    DELETE FROM vehiculos WHERE placa=?
+    RETURNING fecha_entrada, hora_entrada, minuto_entrada, tipo
+"""
+
+_SQL_INSERTAR_HISTORIAL = """
+    INSERT INTO historial 
+    (placa, tipo, fecha_entrada, hora_entrada, minuto_entrada, 
+     fecha_salida, hora_salida, minuto_salida, duracion_horas, valor_pagado, usuario_registro)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_VEHICULOS_ACTIVOS = """
+    SELECT placa, tipo, fecha_entrada, hora_entrada, minuto_entrada
+    FROM vehiculos
+    ORDER BY fecha_entrada, hora_entrada, minuto_entrada
+"""
+
+# Huella de los datos: cada ingreso cambia la cantidad de vehículos activos y
+# cada salida agrega una fila al historial (nuevo id máximo)
+_SQL_HUELLA = """
+    SELECT (SELECT COUNT(*) FROM vehiculos), (SELECT MAX(id) FROM historial)
+"""
+
+# Columnas del historial tal como las retorna obtener_historial
+_COLUMNAS_HISTORIAL = """
+    placa, tipo, fecha_entrada, hora_entrada, minuto_entrada,
+    fecha_salida, hora_salida, minuto_salida, duracion_horas, valor_pagado
+"""
+
+# Columnas del historial ya formateadas para exportar: SQLite arma las horas
+# 'H:MM' y Python solo escribe las filas tal como llegan del cursor
+_COLUMNAS_EXPORTACION = """
+    placa AS "Placa", tipo AS "Tipo", fecha_entrada AS "Fecha Entrada",
+    printf('%d:%02d', hora_entrada, minuto_entrada) AS "Hora Entrada",
+    fecha_salida AS "Fecha Salida",
+    CASE WHEN fecha_salida <> '' THEN printf('%d:%02d', hora_salida, minuto_salida)
+         ELSE 'N/A' END AS "Hora Salida",
+    duracion_horas AS "Duración (horas)", valor_pagado AS "Valor"
+"""
+
+# Columnas para la exportación a Excel: igual que la CSV, pero sin salida
+# registrada la fecha de salida también se muestra como 'N/A'
+_COLUMNAS_EXCEL = """
+    placa AS "Placa", tipo AS "Tipo", fecha_entrada AS "Fecha Entrada",
+    printf('%d:%02d', hora_entrada, minuto_entrada) AS "Hora Entrada",
+    CASE WHEN fecha_salida <> '' THEN fecha_salida ELSE 'N/A' END AS "Fecha Salida",
+    CASE WHEN fecha_salida <> '' THEN printf('%d:%02d', hora_salida, minuto_salida)
+         ELSE 'N/A' END AS "Hora Salida",
+    duracion_horas AS "Duración (horas)", valor_pagado AS "Valor"
+"""
+
+# Cantidad de filas de una consulta del historial (ver contar_historial)
+_COLUMNAS_CONTEO = "COUNT(*)"
+
+# Largo máximo del texto de cada columna de _COLUMNAS_EXCEL. La hoja de Excel se
+# escribe en modo de solo escritura, donde los anchos de columna deben fijarse
+# antes de la primera fila; SQLite los calcula con una sola consulta
+_COLUMNAS_EXCEL_ANCHOS = """
+    MAX(LENGTH(placa)), MAX(LENGTH(tipo)), MAX(LENGTH(fecha_entrada)),
+    MAX(LENGTH(printf('%d:%02d', hora_entrada, minuto_entrada))),
+    MAX(LENGTH(CASE WHEN fecha_salida <> '' THEN fecha_salida ELSE 'N/A' END)),
+    MAX(LENGTH(CASE WHEN fecha_salida <> '' THEN printf('%d:%02d', hora_salida, minuto_salida)
+                    ELSE 'N/A' END)),
+    MAX(LENGTH(duracion_horas)), MAX(LENGTH(valor_pagado))
+"""
+
+# Encabezados de las exportaciones a CSV (tanto la de Python como la del programa
+# sqlite3, para que ambas produzcan el mismo archivo)
+_ENCABEZADOS_EXPORTACION = [
+    "Placa", "Tipo", "Fecha Entrada", "Hora Entrada",
+    "Fecha Salida", "Hora Salida", "Duración (horas)", "Valor"
+]
+
+# Exportación del historial completo con el programa sqlite3: produce las mismas
+# columnas y formatos que exportar_historial_csv
+_SQL_EXPORTAR_CSV = f"""
+    SELECT {_COLUMNAS_EXPORTACION}
+    FROM historial
+    ORDER BY fecha_registro DESC, id DESC;
+"""
+
+# Condiciones opcionales de las consultas del historial, en el mismo orden que
+# los parámetros filtro_placa, filtro_tipo, fecha_inicio y fecha_fin
+_FILTROS_HISTORIAL = ("placa LIKE ?", "tipo = ?", "fecha_entrada >= ?", "fecha_entrada <= ?")
+
+def _armar_sql_historial(columnas, activos, rango, limite):
+    """
+    Arma una consulta del historial para una combinación de filtros.
+    
+    Args:
+        columnas (str): Lista de columnas del SELECT
+        activos (tuple): Un booleano por cada condición de _FILTROS_HISTORIAL
+        rango (bool): Si se filtra por rango de id (exportación incremental)
+        limite (bool): Si se pagina con LIMIT/OFFSET
+    
+    Returns:
+        str: Sentencia SQL con los marcadores '?' en el orden de los parámetros
+    """
+    condiciones = [condicion for condicion, activo in zip(_FILTROS_HISTORIAL, activos) if activo]
+    if rango:
+        condiciones.append("id > ? AND id <= ?")
+    query = f"SELECT {columnas} FROM historial"
+    if condiciones:
+        query += " WHERE " + " AND ".join(condiciones)
+    # Exportación incremental en orden de inserción; si no, los más recientes primero.
+    # fecha_registro se guarda al segundo: el id desempata los registros del mismo
+    # segundo, así el orden es siempre el mismo y las páginas no se repiten ni saltan filas
+    query += " ORDER BY id" if rango else " ORDER BY fecha_registro DESC, id DESC"
+    if limite:
+        query += " LIMIT ? OFFSET ?"
+    return query
+
+# Todas las consultas posibles del historial, armadas una sola vez al importar
+# el módulo. La clave es (columnas, placa, tipo, fecha_inicio, fecha_fin, rango,
+# limite), con un booleano por cada parte opcional de la consulta
+_SQL_HISTORIAL = {
+    (columnas, *activos, rango, limite): _armar_sql_historial(columnas, activos, rango, limite)
+    for columnas in (_COLUMNAS_HISTORIAL, _COLUMNAS_EXPORTACION, _COLUMNAS_EXCEL, _COLUMNAS_EXCEL_ANCHOS, _COLUMNAS_CONTEO)
+    for activos in itertools.product((False, True), repeat=len(_FILTROS_HISTORIAL))
+    for rango in (False, True)
+    for limite in (False, True)
+}
+
+# Tamaño de la caché de sentencias preparadas de cada conexión (por defecto 128
+# en Python 3.11). Cabe cada una de las variantes de _SQL_HISTORIAL, más un margen
+# para el resto de sentencias del módulo; así las consultas del historial no
+# desplazan de la caché a las sentencias de registro de ingresos y salidas
+SENTENCIAS_EN_CACHE = len(_SQL_HISTORIAL) + 64
+
+# Segundos que una conexión espera a que se libere un bloqueo de otro proceso
+# antes de fallar con "database is locked" (equivale a PRAGMA busy_timeout=5000)
+ESPERA_BLOQUEO = 5.0
+
+# Parámetros de rendimiento aplicados al abrir la conexión (ver _configurar_pragmas)
+_PRAGMAS = """
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=268435456;
+"""
+
+# Parámetros de las conexiones de solo lectura (el modo WAL queda guardado en el archivo)
+_PRAGMAS_LECTURA = """
+    PRAGMA query_only=1;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-16384;
+    PRAGMA mmap_size=268435456;
+"""
 
 def conectar():
     """
-    Establece conexión con la base de datos y crea las tablas si no existen.
+    Retorna la conexión con la base de datos, creándola la primera vez.
     
     Esta función es fundamental para el sistema ya que:
     1. Asegura que el directorio de datos exista
-    2. Establece la conexión con la base de datos SQLite
+    2. Establece la conexión con la base de datos SQLite (una sola vez)
     3. Crea las tablas necesarias si no existen
     4. Inicializa las tarifas por defecto si es necesario
     
+    Las llamadas siguientes retornan la misma conexión sin tocar el disco.
+    
     Returns:
         sqlite3.Connection: Objeto de conexión a la base de datos
     """
-    # Creamos el directorio padre si no existe
-    DB_PATH.parent.mkdir(exist_ok=True)
-    
-    # Establecemos conexión con la base de datos
-    conn = sqlite3.connect(DB_PATH)
-    
-    # Creamos la tabla de vehículos activos con soporte para fecha y hora completas
-    # Esta tabla almacena los vehículos que actualmente están en el parqueadero
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS vehiculos (
-            placa TEXT PRIMARY KEY,  -- Placa del vehículo como clave primaria
-            fecha_entrada TEXT,      -- Fecha de entrada en formato YYYY-MM-DD
-            hora_entrada INTEGER,    -- Hora de entrada (0-23)
-            minuto_entrada INTEGER,  -- Minuto de entrada (0-59)
-            tipo TEXT CHECK (tipo IN ('Carro', 'Moto')),  -- Tipo de vehículo con restricción
-            usuario TEXT             -- Usuario que registró la entrada
-        )
-    ''')
-    
-    # Creamos la tabla de historial con soporte para fecha y hora completas
-    # Esta tabla almacena el registro histórico de todos los vehículos que han usado el parqueadero
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS historial (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,  -- ID único autoincremental
-            placa TEXT,                -- Placa del vehículo
-            tipo TEXT,                 -- Tipo de vehículo
-            fecha_entrada TEXT,        -- Fecha de entrada en formato YYYY-MM-DD
-            hora_entrada INTEGER,      -- Hora de entrada (0-23)
-            minuto_entrada INTEGER,    -- Minuto de entrada (0-59)
-            fecha_salida TEXT,         -- Fecha de salida en formato YYYY-MM-DD
-            hora_salida INTEGER,       -- Hora de salida (0-23)
-            minuto_salida INTEGER,     -- Minuto de salida (0-59)
-            duracion_horas REAL,       -- Duración en horas (con decimales para fracciones)
-            valor_pagado REAL,         -- Valor pagado
-            usuario_registro TEXT,     -- Usuario que registró la salida
-            fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP  -- Fecha y hora del registro
-        )
-    ''')
-    
-    # Creamos tabla de tarifas
-    # Esta tabla permite configurar diferentes tarifas según tipo de vehículo, día y hora
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS tarifas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,  -- ID único autoincremental
-            tipo_vehiculo TEXT,        -- Tipo de vehículo (Carro o Moto)
-            dia_semana TEXT,           -- Día de la semana o 'todos'
-            hora_inicio INTEGER,       -- Hora de inicio para esta tarifa
-            hora_fin INTEGER,          -- Hora de fin para esta tarifa
-            tarifa_hora REAL,          -- Valor por hora completa
-            tarifa_fraccion REAL,      -- Valor por fracción (15 minutos)
-            activo INTEGER DEFAULT 1   -- Indica si la tarifa está activa (1) o no (0)
-        )
-    ''')
-    
-    # Insertamos tarifas por defecto si no existen
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM tarifas")
-    if cursor.fetchone()[0] == 0:
-        # Tarifa para carros (todos los días)
-        conn.execute(
-            "INSERT INTO tarifas (tipo_vehiculo, dia_semana, hora_inicio, hora_fin, tarifa_hora, tarifa_fraccion) VALUES (?, ?, ?, ?, ?, ?)",
-            ("Carro", "todos", 0, 23, 5000, 1200)  # $5000 por hora, $1200 por fracción
+    global _conn
+    
+    # Si la conexión ya está abierta, la reutilizamos (sin tomar el bloqueo)
+    if _conn is not None:
+        return _conn
+    
+    with _bloqueo_conexion:
+        # Otro hilo pudo abrirla mientras esperábamos el bloqueo
+        if _conn is not None:
+            return _conn
+        
+        # Creamos el directorio padre si no existe
+        DB_PATH.parent.mkdir(exist_ok=True)
+        
+        # Establecemos conexión con la base de datos
+        # check_same_thread=False permite usar la conexión desde temporizadores o hilos de la interfaz
+        # cached_statements mantiene compiladas las sentencias usadas con frecuencia
+        # isolation_level="IMMEDIATE": cada operación toma el bloqueo de escritura al
+        # empezar su transacción, en lugar de intentar subirlo a mitad de camino
+        conn = sqlite3.connect(
+            DB_PATH,
+            timeout=ESPERA_BLOQUEO,
+            check_same_thread=False,
+            cached_statements=SENTENCIAS_EN_CACHE,
+            isolation_level="IMMEDIATE",
         )
-        # Tarifa para motos (todos los días)
-        conn.execute(
-            "INSERT INTO tarifas (tipo_vehiculo, dia_semana, hora_inicio, hora_fin, tarifa_hora, tarifa_fraccion) VALUES (?, ?, ?, ?, ?, ?)",
-            ("Moto", "todos", 0, 23, 3500, 900)  # $3500 por hora, $900 por fracción
+        
+        # Ajustamos el motor para escrituras rápidas (solo al abrir la conexión)
+        _configurar_pragmas(conn)
+        
+        # Preparamos el esquema una única vez por proceso
+        _init_schema(conn)
+        
+        _conn = conn
+        return _conn
+
+@contextmanager
+def conectar_lectura():
+    """
+    Presta una conexión de solo lectura (PRAGMA query_only) para consultas.
+    
+    Las consultas que no modifican datos usan estas conexiones en lugar de la
+    conexión compartida de escritura, de modo que varias lecturas (por ejemplo,
+    una exportación larga y el refresco de la tabla de activos) pueden correr
+    a la vez sin esperar a las escrituras. Se abren a demanda, hasta LECTORES,
+    y se devuelven al terminar el bloque "with".
+    
+    Con una base en memoria (':memory:'), o dentro de modo_masivo() en el mismo
+    hilo (para ver los cambios aún no confirmados), se usa la conexión de escritura.
+    En memoria esa conexión es compartida con los demás hilos, así que la lectura
+    toma _bloqueo_escritura de principio a fin: no ve transacciones a medio hacer.
+    
+    Ejemplo:
+        with conectar_lectura() as conn:
+            filas = conn.execute("SELECT ...").fetchall()
+    
+    Yields:
+        sqlite3.Connection: Conexión para consultar
+    """
+    # conectar() garantiza que el esquema exista antes de abrir lectores
+    conn = conectar()
+    if getattr(_estado_hilo, "masivo", False):
+        yield conn
+        return
+    if str(DB_PATH) == ":memory:":
+        with _bloqueo_escritura:
+            yield conn
+        return
+    
+    lector = _tomar_lector()
+    try:
+        yield lector
+    finally:
+        _lectores.put(lector)
+
+def _tomar_lector():
+    """
+    Toma una conexión de lectura libre, abriendo una nueva si aún no hay LECTORES.
+    
+    Si todas están en uso, espera hasta ESPERA_BLOQUEO segundos a que se
+    devuelva alguna.
+    
+    Returns:
+        sqlite3.Connection: Conexión de solo lectura
+    
+    Raises:
+        sqlite3.OperationalError: Si no se libera ninguna conexión a tiempo
+    """
+    global _lectores_abiertos
+    try:
+        return _lectores.get_nowait()
+    except queue.Empty:
+        pass
+    
+    with _bloqueo_conexion:
+        abrir = _lectores_abiertos < LECTORES
+        if abrir:
+            _lectores_abiertos += 1
+    if not abrir:
+        try:
+            return _lectores.get(timeout=ESPERA_BLOQUEO)
+        except queue.Empty:
+            raise sqlite3.OperationalError("No hay conexiones de lectura libres") from None
+    
+    try:
+        lector = sqlite3.connect(
+            DB_PATH, timeout=ESPERA_BLOQUEO, check_same_thread=False, cached_statements=SENTENCIAS_EN_CACHE
         )
+        lector.executescript(_PRAGMAS_LECTURA)
+    except Exception:
+        # La conexión no llegó a existir: liberamos su cupo para no agotar el pool
+        with _bloqueo_conexion:
+            _lectores_abiertos -= 1
+        raise
+    return lector
+
+def _cerrar_conexion():
+    """
+    Cierra la conexión compartida y las de lectura libres.
     
-    # Guardamos los cambios y retornamos la conexión
+    Se registra con atexit para liberar el archivo de la base de datos
+    cuando la aplicación termina. Antes de cerrar ejecuta PRAGMA optimize,
+    que actualiza las estadísticas del planificador de consultas solo si
+    hacen falta. Las conexiones de lectura prestadas en ese momento siguen
+    contando en el pool y se cerrarán en una llamada posterior.
+    """
+    global _conn, _lectores_abiertos
+    with _bloqueo_conexion:
+        while True:
+            try:
+                _lectores.get_nowait().close()
+            except queue.Empty:
+                break
+            _lectores_abiertos -= 1
+        
+        if _conn is None:
+            return
+        try:
+            _conn.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            log.exception("Error al optimizar la base de datos")
+        _conn.close()
+        _conn = None
+
+atexit.register(_cerrar_conexion)
+
+def _configurar_pragmas(conn):
+    """
+    Configura los parámetros de rendimiento de SQLite para la conexión.
+    
+    - journal_mode=WAL: las escrituras se agregan a un registro secuencial y
+      los lectores no se bloquean mientras se escribe (no aplica a ':memory:',
+      que no tiene archivo de registro)
+    - synchronous=NORMAL: en modo WAL evita un fsync por cada commit sin
+      arriesgar la integridad de la base de datos
+    - temp_store=MEMORY: tablas temporales y ordenamientos en memoria
+    - cache_size=-65536: caché de páginas de hasta 64 MB (se reserva a medida
+      que se usa, de modo que en bases pequeñas no ocupa más memoria)
+    - mmap_size: lectura del archivo mediante memoria mapeada (256 MB)
+    
+    Args:
+        conn (sqlite3.Connection): Conexión recién abierta
+    """
+    if str(DB_PATH) != ":memory:":
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_PRAGMAS)
+
+def _init_schema(conn):
+    """
+    Crea las tablas si no existen e inserta las tarifas por defecto.
+    
+    Se ejecuta una sola vez, al abrir la conexión compartida. Todo el DDL
+    se envía en un único executescript() en lugar de una llamada por tabla.
+    
+    Args:
+        conn (sqlite3.Connection): Conexión recién abierta
+    """
+    # Actualizamos las tablas creadas por versiones anteriores
+    # (va antes del esquema para que los índices se creen sobre la tabla definitiva)
+    _migrar_esquema(conn)
+    
+    # Creamos tablas e índices que falten (los del historial, solo si la tabla
+    # ya tiene el formato actual)
+    conn.executescript(_ESQUEMA)
+    if not _historial_antiguo(conn):
+        conn.executescript(_ESQUEMA_INDICES_HISTORIAL)
+    
+    # Insertamos las tarifas por defecto de los tipos de vehículo que no tienen
+    # ninguna: una por tipo, para todos los días y horas (los tipos con tarifas
+    # propias se conservan sin cambios)
+    conn.executemany(
+        _SQL_INSERTAR_TARIFA,
+        [(tipo, DIA_TODOS, 0, 23, *tarifa) for tipo, tarifa in TARIFAS_POR_DEFECTO.items()]
+    )
+    
+    # Guardamos los cambios
     conn.commit()
-    return conn
+    
+    # Detectamos si basta con una tarifa fija por tipo de vehículo
+    _detectar_tarifas_simples(conn)
+    
+    # Si nunca se han calculado estadísticas, las calculamos una vez para que
+    # el planificador de consultas sepa aprovechar los índices
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'").fetchone() is None:
+        conn.execute("ANALYZE")
+
+def _detectar_tarifas_simples(conn):
+    """
+    Actualiza _tarifas_simples según el contenido actual de la tabla tarifas.
+    
+    Args:
+        conn (sqlite3.Connection): Conexión con la base de datos
+    """
+    global _tarifas_simples
+    filas = conn.execute(f"""
+        SELECT tipo_vehiculo, COUNT(*),
+               MIN(dia_semana = {DIA_TODOS} AND hora_inicio <= 0 AND hora_fin >= 23),
+               tarifa_hora, tarifa_fraccion
+        FROM tarifas
+        WHERE activo = 1
+        GROUP BY tipo_vehiculo
+    """).fetchall()
+    
+    if all(cantidad == 1 and todo_el_dia for _, cantidad, todo_el_dia, _, _ in filas):
+        _tarifas_simples = {tipo: (tarifa_hora, tarifa_fraccion) for tipo, _, _, tarifa_hora, tarifa_fraccion in filas}
+    else:
+        _tarifas_simples = None
+
+def _migrar_esquema(conn):
+    """
+    Actualiza las tablas creadas por versiones anteriores del sistema.
+    
+    - historial: se quita AUTOINCREMENT de la columna id y fecha_registro
+      pasa de texto a segundos enteros. Una tabla del formato antiguo (sin
+      fechas de entrada y salida) no se toca aquí: la convierte
+      migrar_datos_antiguos()
+    - vehiculos: se quita la restricción CHECK sobre el tipo
+    - tarifas: dia_semana pasa del nombre del día a un número (7 = todos) y se
+      eliminan las tarifas repetidas (mismo tipo, día y franja horaria), que
+      impedirían crear idx_tarifas_unica; se conserva la activa (y entre
+      varias activas o varias inactivas, la más antigua), para no cambiar el
+      precio vigente
+    
+    Args:
+        conn (sqlite3.Connection): Conexión con la base de datos
+    """
+    sql = _sql_tabla(conn, "historial")
+    if sql is not None and not _historial_antiguo(conn) and (
+        "AUTOINCREMENT" in sql.upper() or "TIMESTAMP" in sql.upper()
+    ):
+        _reconstruir_tabla(conn, "historial", _DDL_HISTORIAL, _CONVERSION_FECHA_REGISTRO)
+    
+    sql = _sql_tabla(conn, "vehiculos")
+    if sql is not None and "CHECK" in sql.upper():
+        _reconstruir_tabla(conn, "vehiculos", _DDL_VEHICULOS)
+    
+    sql = _sql_tabla(conn, "tarifas")
+    if sql is not None and "DIA_SEMANA TEXT" in " ".join(sql.upper().split()):
+        _reconstruir_tabla(conn, "tarifas", _DDL_TARIFAS, _CONVERSION_DIA_SEMANA)
+    
+    if sql is not None and conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name='idx_tarifas_unica'"
+    ).fetchone() is None:
+        with conn:
+            borradas = conn.execute("""
+                DELETE FROM tarifas WHERE id NOT IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY tipo_vehiculo, dia_semana, hora_inicio, hora_fin
+                            ORDER BY activo DESC, id
+                        ) AS orden
+                        FROM tarifas
+                    )
+                    WHERE orden = 1
+                )
+            """).rowcount
+        if borradas:
+            log.warning("Se eliminaron %d tarifas repetidas", borradas)
+
+def _historial_antiguo(conn):
+    """
+    Indica si la tabla historial tiene el formato antiguo (sin fecha_entrada).
+    
+    Args:
+        conn (sqlite3.Connection): Conexión con la base de datos
+    
+    Returns:
+        bool: True si la tabla existe y le falta la columna fecha_entrada
+    """
+    columnas = [col[1] for col in conn.execute("PRAGMA table_info(historial)")]
+    return bool(columnas) and "fecha_entrada" not in columnas
+
+def _sql_tabla(conn, tabla):
+    """
+    Retorna la sentencia CREATE TABLE guardada para una tabla.
+    
+    Args:
+        conn (sqlite3.Connection): Conexión con la base de datos
+        tabla (str): Nombre de la tabla
+    
+    Returns:
+        str: Sentencia CREATE TABLE, o None si la tabla no existe
+    """
+    fila = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (tabla,)
+    ).fetchone()
+    return fila[0] if fila else None
+
+def _reconstruir_tabla(conn, tabla, ddl, conversiones=None):
+    """
+    Reemplaza una tabla por otra con el esquema actual, conservando sus filas.
+    
+    Copia todas las filas a una tabla nueva creada con ddl y la reemplaza,
+    todo dentro de una misma transacción.
+    
+    Args:
+        conn (sqlite3.Connection): Conexión con la base de datos
+        tabla (str): Nombre de la tabla a reconstruir
+        ddl (str): Plantilla CREATE TABLE con el marcador {tabla}
+        conversiones (dict, optional): Expresión SQL con la que se copia cada
+            columna indicada, en lugar de copiarla tal cual
+    """
+    # Copiamos por nombre de columna para no depender del orden físico
+    nombres = [col[1] for col in conn.execute(f"PRAGMA table_info({tabla})")]
+    conversiones = conversiones or {}
+    columnas = ", ".join(nombres)
+    valores = ", ".join(conversiones.get(nombre, nombre) for nombre in nombres)
+    with conn:
+        # BEGIN explícito: las sentencias DDL no abren transacción por sí solas
+        conn.execute("BEGIN")
+        conn.execute(ddl.format(tabla=f"{tabla}_nueva"))
+        conn.execute(f"INSERT INTO {tabla}_nueva ({columnas}) SELECT {valores} FROM {tabla}")
+        conn.execute(f"DROP TABLE {tabla}")
+        conn.execute(f"ALTER TABLE {tabla}_nueva RENAME TO {tabla}")
+
+def _contar_inserciones_historial(conn, cantidad=1):
+    """
+    Cuenta inserciones en historial y ejecuta ANALYZE al superar el umbral.
+    
+    Mantiene actualizadas las estadísticas que usa SQLite para elegir el
+    índice de fecha_registro a medida que la tabla crece.
+    
+    Args:
+        conn (sqlite3.Connection): Conexión con la base de datos
+        cantidad (int, optional): Número de filas insertadas
+    """
+    global _inserciones_historial
+    _inserciones_historial += cantidad
+    if _inserciones_historial >= UMBRAL_ANALYZE:
+        _inserciones_historial = 0
+        conn.execute("ANALYZE historial")
+
+@contextmanager
+def modo_masivo():
+    """
+    Agrupa varios registros en una sola transacción (un solo fsync).
+    
+    Cada registrar_ingreso / registrar_salida confirma su propia transacción;
+    al registrar muchos vehículos seguidos eso implica una escritura a disco
+    por vehículo. Dentro de este bloque las operaciones no confirman por su
+    cuenta: todo se confirma al salir del bloque, o se revierte si ocurre
+    una excepción.
+    
+    Ejemplo:
+        with modo_masivo():
+            for placa in placas:
+                registrar_salida(placa)
+    
+    Yields:
+        sqlite3.Connection: Conexión con la transacción abierta
+    """
+    conn = conectar()
+    
+    # Si ya estamos dentro de un bloque masivo, simplemente lo reutilizamos
+    if getattr(_estado_hilo, "masivo", False):
+        yield conn
+        return
+    
+    # Ningún otro hilo escribe mientras dure el bloque
+    with _bloqueo_escritura:
+        # BEGIN IMMEDIATE reserva la escritura desde el inicio del bloque
+        conn.execute("BEGIN IMMEDIATE")
+        _estado_hilo.masivo = True
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            _estado_hilo.masivo = False
+
+@contextmanager
+def _transaccion(conn):
+    """
+    Ejecuta una operación de escritura como una unidad atómica.
+    
+    Fuera de modo_masivo() equivale a "with conn:" (commit al terminar,
+    rollback si hay excepción). Dentro de modo_masivo() usa un SAVEPOINT:
+    si la operación falla solo se revierte esa operación, y la confirmación
+    queda a cargo del bloque masivo.
+    
+    Toma el bloqueo de escritura, de modo que las transacciones de distintos
+    hilos sobre la conexión compartida no se mezclan.
+    
+    Args:
+        conn (sqlite3.Connection): Conexión compartida
+    """
+    if not getattr(_estado_hilo, "masivo", False):
+        with _bloqueo_escritura, conn:
+            yield conn
+        return
+    
+    conn.execute("SAVEPOINT operacion")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK TO operacion")
+        conn.execute("RELEASE operacion")
+        raise
+    conn.execute("RELEASE operacion")
 
 def obtener_fecha_hora_actual():
     """
@@ -117,11 +867,16 @@ def obtener_fecha_hora_actual():
             - hora_actual (int): Hora en formato 24h (0-23)
             - minuto_actual (int): Minutos (0-59)
     """
+    global _ultima_fecha
+    
     # Obtenemos la fecha y hora actual
     ahora = datetime.now()
     
-    # Formateamos la fecha como YYYY-MM-DD
-    fecha_actual = ahora.strftime("%Y-%m-%d")
+    # Formateamos la fecha como YYYY-MM-DD solo si cambió el día
+    dia, fecha_actual = _ultima_fecha
+    if dia != ahora.toordinal():
+        fecha_actual = f"{ahora.year:04d}-{ahora.month:02d}-{ahora.day:02d}"
+        _ultima_fecha = (ahora.toordinal(), fecha_actual)
     
     # Extraemos la hora y minuto
     hora_actual = ahora.hour
@@ -148,30 +903,50 @@ def calcular_duracion(fecha_entrada, hora_entrada, minuto_entrada, fecha_salida,
     Returns:
         float: Duración en horas con decimales (ej: 2.5 para 2 horas y 30 minutos)
     """
-    # Convertimos las cadenas de fecha a objetos datetime
-    entrada = datetime.combine(
-        datetime.strptime(fecha_entrada, "%Y-%m-%d").date(),
-        time(hour=hora_entrada, minute=minuto_entrada)
-    )
-    
-    salida = datetime.combine(
-        datetime.strptime(fecha_salida, "%Y-%m-%d").date(),
-        time(hour=hora_salida, minute=minuto_salida)
+    # Convertimos cada momento a minutos absolutos (enteros) y restamos
+    minutos = (
+        _minutos_absolutos(fecha_salida, hora_salida, minuto_salida)
+        - _minutos_absolutos(fecha_entrada, hora_entrada, minuto_entrada)
     )
     
     # Si la salida es anterior a la entrada, asumimos que pasó al menos un día
     # Esto maneja el caso donde un vehículo entra un día y sale al siguiente
-    if salida < entrada:
-        salida = salida.replace(day=salida.day + 1)
+    if minutos < 0:
+        minutos += 1440
     
-    # Calculamos la diferencia en horas (con decimales)
-    # total_seconds() da la diferencia en segundos, dividimos por 3600 para obtener horas
-    diferencia = salida - entrada
-    horas = diferencia.total_seconds() / 3600
+    # Pasamos de minutos a horas (con decimales)
+    horas = minutos / 60
     
     # Redondeamos a 2 decimales para mejor legibilidad
     return round(horas, 2)
 
+def _minutos_absolutos(fecha, hora, minuto):
+    """
+    Convierte una fecha 'YYYY-MM-DD' con hora y minuto en minutos absolutos.
+    
+    Usa el número ordinal del día (días desde el año 1), de modo que la
+    diferencia entre dos momentos es una simple resta de enteros, válida
+    aunque haya cambios de día, mes o año entre ellos.
+    
+    Returns:
+        int: Minutos transcurridos desde el inicio del calendario
+    """
+    return _dia_ordinal(fecha) * 1440 + hora * 60 + minuto
+
+@lru_cache(maxsize=4096)
+def _dia_ordinal(fecha):
+    """
+    Convierte una fecha 'YYYY-MM-DD' en su número ordinal (días desde el año 1).
+    
+    Las mismas fechas se repiten en casi todas las operaciones (el día actual y
+    los días de entrada de los vehículos activos), así que cada una se convierte
+    una sola vez y las siguientes se toman de la memoria.
+    
+    Returns:
+        int: Número ordinal del día (el 1 de enero del año 1 es 1, un lunes)
+    """
+    return date.fromisoformat(fecha).toordinal()
+
 def obtener_tarifa(tipo_vehiculo, fecha, hora):
     """
     Obtiene la tarifa aplicable según tipo de vehículo, día y hora.
@@ -182,6 +957,9 @@ def obtener_tarifa(tipo_vehiculo, fecha, hora):
     - Día de la semana
     - Hora del día
     
+    Cada combinación de tipo, día y hora se consulta en la base de datos una
+    sola vez; las llamadas siguientes se responden desde memoria.
+    
     Args:
         tipo_vehiculo (str): Tipo de vehículo ('Carro' o 'Moto')
         fecha (str): Fecha en formato 'YYYY-MM-DD'
@@ -192,40 +970,55 @@ def obtener_tarifa(tipo_vehiculo, fecha, hora):
             - tarifa_hora (float): Tarifa por hora completa
             - tarifa_fraccion (float): Tarifa por fracción (15 minutos)
     """
+    # Con la configuración trivial la tarifa solo depende del tipo de vehículo
+    if _tarifas_simples is not None:
+        tarifa = _tarifas_simples.get(tipo_vehiculo)
+        if tarifa is not None:
+            return tarifa
+    
     try:
+        # Obtenemos el día de la semana (0=lunes, 6=domingo)
+        # (el día ordinal 1 fue lunes, así que el ordinal 7 es domingo)
+        dia_semana = (_dia_ordinal(fecha) + 6) % 7
+        
+        # Si ya consultamos esta combinación, la retornamos sin tocar la base de datos
+        clave = (tipo_vehiculo, dia_semana, hora)
+        tarifa = _cache_tarifas.get(clave)
+        if tarifa is not None:
+            return tarifa
+        
         # Establecemos conexión con la base de datos
         conn = conectar()
-        cursor = conn.cursor()
-        
-        # Obtenemos el día de la semana (0=lunes, 6=domingo)
-        dia_semana = datetime.strptime(fecha, "%Y-%m-%d").weekday()
-        dias = ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]
         
         # Buscamos tarifa específica para este día y hora
-        # La consulta prioriza tarifas específicas para el día sobre tarifas genéricas ('todos')
-        cursor.execute("""
-            SELECT tarifa_hora, tarifa_fraccion FROM tarifas 
-            WHERE tipo_vehiculo = ? AND 
-                  (dia_semana = ? OR dia_semana = 'todos') AND
-                  hora_inicio <= ? AND hora_fin >= ? AND
-                  activo = 1
-            ORDER BY CASE WHEN dia_semana = ? THEN 0 ELSE 1 END
-            LIMIT 1
-        """, (tipo_vehiculo, dias[dia_semana], hora, hora, dias[dia_semana]))
-        
-        resultado = cursor.fetchone()
-        if resultado:
-            return resultado
+        # La consulta prioriza tarifas específicas para el día sobre tarifas genéricas (todos)
+        resultado = conn.execute(_SQL_TARIFA, (tipo_vehiculo, dia_semana, hora, hora)).fetchone()
         
         # Si no hay tarifa específica, usamos la tarifa por defecto
-        # Carros: $5000/hora, $1200/fracción
-        # Motos: $3500/hora, $900/fracción
-        return (5000, 1200) if tipo_vehiculo == "Carro" else (3500, 900)
+        tarifa = resultado or (TARIFAS_POR_DEFECTO["Carro"] if tipo_vehiculo == "Carro" else TARIFAS_POR_DEFECTO["Moto"])
+        _cache_tarifas[clave] = tarifa
+        return tarifa
     
-    except sqlite3.Error as e:
+    except sqlite3.Error:
         # En caso de error, registramos el problema y retornamos tarifas por defecto
-        print(f"Error al obtener tarifa: {e}")
-        return (5000, 1200) if tipo_vehiculo == "Carro" else (3500, 900)
+        log.exception("Error al obtener tarifa")
+        return TARIFAS_POR_DEFECTO["Carro"] if tipo_vehiculo == "Carro" else TARIFAS_POR_DEFECTO["Moto"]
+
+def invalidar_cache_tarifas():
+    """
+    Descarta las tarifas guardadas en memoria por obtener_tarifa.
+    
+    Debe llamarse después de modificar la tabla tarifas para que los
+    siguientes cálculos usen los valores nuevos.
+    """
+    global _tarifas_simples
+    _cache_tarifas.clear()
+    try:
+        _detectar_tarifas_simples(conectar())
+    except sqlite3.Error:
+        # Sin poder revisar la tabla, usamos siempre la búsqueda normal
+        log.exception("Error al revisar tarifas")
+        _tarifas_simples = None
 
 def calcular_valor(tipo_vehiculo, duracion_horas, fecha_entrada, hora_entrada):
     """
@@ -245,47 +1038,35 @@ def calcular_valor(tipo_vehiculo, duracion_horas, fecha_entrada, hora_entrada):
     Returns:
         float: Valor a pagar
     """
-    try:
-        # Obtenemos la tarifa aplicable para este vehículo, fecha y hora
-        tarifa_hora, tarifa_fraccion = obtener_tarifa(tipo_vehiculo, fecha_entrada, hora_entrada)
-        
-        # Calculamos horas completas y fracción
-        horas_completas = int(duracion_horas)  # Parte entera (horas completas)
-        fraccion = duracion_horas - horas_completas  # Parte decimal (fracción de hora)
-        
-        # Si hay fracción, aplicamos tarifa por fracción (cada 15 minutos)
-        # El sistema cobra por intervalos de 15 minutos (0.25 horas)
-        if fraccion > 0:
-            if fraccion <= 0.25:  # Hasta 15 minutos
-                valor_fraccion = tarifa_fraccion
-            elif fraccion <= 0.5:  # Hasta 30 minutos
-                valor_fraccion = tarifa_fraccion * 2
-            elif fraccion <= 0.75:  # Hasta 45 minutos
-                valor_fraccion = tarifa_fraccion * 3
-            else:  # Más de 45 minutos
-                valor_fraccion = tarifa_hora  # Cobra hora completa
-        else:
-            valor_fraccion = 0
-        
-        # Calculamos valor total: (horas completas * tarifa por hora) + valor por fracción
-        valor_total = (horas_completas * tarifa_hora) + valor_fraccion
-        
-        # Redondeamos para evitar decimales en el valor final
-        return round(valor_total, 0)
+    # Obtenemos la tarifa aplicable para este vehículo, fecha y hora
+    tarifa_hora, tarifa_fraccion = obtener_tarifa(tipo_vehiculo, fecha_entrada, hora_entrada)
     
-    except Exception as e:
-        # En caso de error, registramos el problema y usamos un cálculo simplificado
-        print(f"Error en cálculo de valor: {e}")
-        # Valores por defecto en caso de error
-        tarifas = {"Carro": 5000, "Moto": 3500}
-        return tarifas.get(tipo_vehiculo, 3000) * duracion_horas
+    # Calculamos horas completas y minutos restantes con aritmética entera
+    # (la duración viene redondeada a 2 decimales, que siempre corresponde a un
+    # número exacto de minutos)
+    horas_completas, minutos = divmod(round(duracion_horas * 60), 60)
+    
+    # El sistema cobra por intervalos de 15 minutos: sin fracción no se cobra
+    # nada, hasta 15, 30 o 45 minutos se cobran 1, 2 o 3 fracciones y más de
+    # 45 minutos se cobra la hora completa. En lugar de una cadena de if/elif,
+    # los intervalos iniciados (0 a 4, redondeando hacia arriba) indican la
+    # posición en una tabla de valores
+    valores_fraccion = (0, tarifa_fraccion, tarifa_fraccion * 2, tarifa_fraccion * 3, tarifa_hora)
+    valor_fraccion = valores_fraccion[-(-minutos // 15)]
+    
+    # Calculamos valor total: (horas completas * tarifa por hora) + valor por fracción
+    valor_total = (horas_completas * tarifa_hora) + valor_fraccion
+    
+    # Redondeamos para evitar decimales en el valor final
+    return round(valor_total, 0)
 
 def validar_placa(placa):
     """
     Valida el formato de la placa según normativa colombiana.
     
-    Esta función implementa una validación básica del formato de placas:
-    - Longitud entre 5 y 7 caracteres
+    Formatos aceptados (sin distinguir mayúsculas de minúsculas):
+    - 3 letras y 3 números (carros), por ejemplo ABC123
+    - 3 letras, 2 números y opcionalmente una letra (motos), por ejemplo ABC12 o ABC12D
     
     Args:
         placa (str): Placa del vehículo a validar
@@ -293,22 +1074,19 @@ def validar_placa(placa):
     Returns:
         bool: True si la placa es válida, False en caso contrario
     """
-    # Verificamos que la placa no esté vacía y tenga la longitud adecuada
-    if not placa or len(placa) < 5 or len(placa) > 7:
+    # Verificamos que la placa sea texto y coincida completa con el patrón
+    if not isinstance(placa, str):
         return False
-    
-    # Formato básico: 3 letras seguidas de 3 números (carros) o 2 letras, 2 números y 1 letra (motos)
-    # Nota: En esta versión simplificada, solo verificamos la longitud
-    return True
+    return _PATRON_PLACA.fullmatch(placa.strip().upper()) is not None
 
 def registrar_ingreso(placa, fecha=None, hora=None, minuto=None, tipo="Carro", usuario="sistema"):
     """
     Registra el ingreso de un vehículo al parqueadero.
     
     Esta función realiza las siguientes operaciones:
-    1. Valida el formato de la placa
-    2. Verifica que el vehículo no esté ya en el parqueadero
-    3. Registra la entrada con fecha y hora
+    1. Valida el formato de la placa y el tipo de vehículo
+    2. Registra la entrada con fecha y hora, siempre que el vehículo
+       no esté ya en el parqueadero (en una sola sentencia SQL)
     
     Args:
         placa (str): Placa del vehículo
@@ -323,51 +1101,49 @@ def registrar_ingreso(placa, fecha=None, hora=None, minuto=None, tipo="Carro", u
             - success (bool): True si la operación fue exitosa, False en caso contrario
             - message (str): Mensaje descriptivo del resultado
     """
-    # Validamos el formato de la placa
+    # Validamos el formato de la placa y la guardamos normalizada, para que
+    # registrar_salida la encuentre aunque se escriba con otro formato
     if not validar_placa(placa):
         return False, "Formato de placa inválido"
+    placa = placa.strip().upper()
+    
+    # Validamos el tipo de vehículo antes de tocar la base de datos
+    tipo = _NORMALIZAR_TIPO.get(tipo.lower() if isinstance(tipo, str) else None)
+    if tipo is None:
+        return False, "Tipo de vehículo inválido"
+    
+    # Si no se proporcionan fecha y hora, usamos la actual
+    if fecha is None or hora is None or minuto is None:
+        fecha, hora, minuto = obtener_fecha_hora_actual()
     
     try:
         # Establecemos conexión con la base de datos
         conn = conectar()
-        cursor = conn.cursor()
         
-        # Verificar si la placa ya está registrada
-        cursor.execute("SELECT placa FROM vehiculos WHERE placa=?", (placa,))
-        if cursor.fetchone():
-            return False, "La placa ya está registrada en el parqueadero"
+        # Insertamos el vehículo en una sola sentencia: si la placa ya existe,
+        # ON CONFLICT no inserta nada y rowcount queda en 0
+        with _transaccion(conn):
+            cursor = conn.execute(
+                _SQL_INSERTAR_VEHICULO, (placa, fecha, hora, minuto, tipo, usuario)
+            )
         
-        # Si no se proporcionan fecha y hora, usamos la actual
-        if fecha is None or hora is None or minuto is None:
-            fecha, hora, minuto = obtener_fecha_hora_actual()
-        
-        # Validamos el tipo de vehículo
-        tipo = tipo.capitalize()
-        if tipo not in ["Carro", "Moto"]:
-            return False, "Tipo de vehículo inválido"
-        
-        # Insertar el vehículo en la tabla de vehículos activos
-        conn.execute(
-            "INSERT INTO vehiculos (placa, fecha_entrada, hora_entrada, minuto_entrada, tipo, usuario) VALUES (?, ?, ?, ?, ?, ?)",
-            (placa, fecha, hora, minuto, tipo, usuario)
-        )
-        conn.commit()
+        if cursor.rowcount != 1:
+            return False, "La placa ya está registrada en el parqueadero"
         return True, "Ingreso registrado correctamente"
     
     except sqlite3.Error as e:
         # En caso de error en la base de datos, registramos el problema
-        print(f"Error en registrar ingreso: {e}")
+        log.exception("Error en registrar ingreso")
         return False, f"Error en la base de datos: {e}"
 
 def registrar_salida(placa, fecha_salida=None, hora_salida=None, minuto_salida=None, usuario="sistema"):
     """
     Registra la salida de un vehículo del parqueadero.
     
-    Esta función realiza las siguientes operaciones:
-    1. Verifica que el vehículo esté en el parqueadero
+    Esta función realiza las siguientes operaciones, dentro de una misma transacción:
+    1. Retira el vehículo de la lista de activos (si está en el parqueadero)
     2. Calcula la duración de la estancia y el valor a pagar
     3. Registra la salida en el historial
-    4. Elimina el vehículo de la lista de activos
     
     Args:
         placa (str): Placa del vehículo
@@ -382,63 +1158,174 @@ def registrar_salida(placa, fecha_salida=None, hora_salida=None, minuto_salida=N
             - result: Si success es True, un diccionario con información de la salida.
                       Si success es False, un mensaje de error.
     """
+    # Si no se proporcionan fecha y hora de salida, usamos la actual
+    if fecha_salida is None or hora_salida is None or minuto_salida is None:
+        fecha_salida, hora_salida, minuto_salida = obtener_fecha_hora_actual()
+    
     try:
         # Establecemos conexión con la base de datos
         conn = conectar()
-        cursor = conn.cursor()
-        
-        # Verificar si el vehículo está en el parqueadero
-        cursor.execute(
-            "SELECT fecha_entrada, hora_entrada, minuto_entrada, tipo FROM vehiculos WHERE placa=?",
-            (placa,)
-        )
-        fila = cursor.fetchone()
-        if not fila:
-            return False, "Vehículo no encontrado en el parqueadero"
-        
-        # Extraemos los datos de entrada
-        fecha_entrada, hora_entrada, minuto_entrada, tipo = fila
-        
-        # Si no se proporcionan fecha y hora de salida, usamos la actual
-        if fecha_salida is None or hora_salida is None or minuto_salida is None:
-            fecha_salida, hora_salida, minuto_salida = obtener_fecha_hora_actual()
-        
-        # Calculamos la duración y el valor a pagar
-        duracion = calcular_duracion(
-            fecha_entrada, hora_entrada, minuto_entrada,
-            fecha_salida, hora_salida, minuto_salida
-        )
         
-        valor = calcular_valor(tipo, duracion, fecha_entrada, hora_entrada)
-        
-        # Registramos en el historial
-        cursor.execute(
-            """
-            INSERT INTO historial 
-            (placa, tipo, fecha_entrada, hora_entrada, minuto_entrada, 
-             fecha_salida, hora_salida, minuto_salida, duracion_horas, valor_pagado, usuario_registro)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (placa, tipo, fecha_entrada, hora_entrada, minuto_entrada,
-             fecha_salida, hora_salida, minuto_salida, duracion, valor, usuario)
-        )
+        # Toda la salida ocurre en una sola transacción: el bloque "with"
+        # confirma los cambios al terminar o los revierte si hay una excepción
+        with _transaccion(conn):
+            return _procesar_salida(conn, placa, fecha_salida, hora_salida, minuto_salida, usuario)
+    
+    except sqlite3.Error as e:
+        # En caso de error en la base de datos, registramos el problema
+        log.exception("Error en registrar salida")
+        return False, f"Error en la base de datos: {e}"
+
+def _procesar_salida(conn, placa, fecha_salida, hora_salida, minuto_salida, usuario):
+    """
+    Ejecuta la salida de un vehículo sin confirmar la transacción.
+    
+    Es el núcleo compartido por registrar_salida y registrar_salida_batch;
+    el llamador decide cuándo se confirma (commit) el trabajo.
+    
+    Args:
+        conn (sqlite3.Connection): Conexión con la transacción en curso
+        placa (str): Placa del vehículo
+        fecha_salida (str): Fecha de salida en formato 'YYYY-MM-DD'
+        hora_salida (int): Hora de salida (0-23)
+        minuto_salida (int): Minuto de salida (0-59)
+        usuario (str): Usuario que registra la salida
+    
+    Returns:
+        tuple: (success, result) con el mismo formato que registrar_salida
+    """
+    # Las placas se guardan normalizadas (ver registrar_ingreso)
+    if isinstance(placa, str):
+        placa = placa.strip().upper()
+    
+    # Retiramos el vehículo de los activos y obtenemos sus datos de entrada
+    # en una sola sentencia
+    fila = conn.execute(_SQL_RETIRAR_VEHICULO, (placa,)).fetchone()
+    if fila is None:
+        return False, "Vehículo no encontrado en el parqueadero"
+    
+    # Extraemos los datos de entrada
+    fecha_entrada, hora_entrada, minuto_entrada, tipo = fila
+    
+    # Calculamos la duración y el valor a pagar
+    duracion = calcular_duracion(
+        fecha_entrada, hora_entrada, minuto_entrada,
+        fecha_salida, hora_salida, minuto_salida
+    )
+    
+    valor = calcular_valor(tipo, duracion, fecha_entrada, hora_entrada)
+    
+    # Registramos en el historial
+    conn.execute(
+        _SQL_INSERTAR_HISTORIAL,
+        (placa, tipo, fecha_entrada, hora_entrada, minuto_entrada,
+         fecha_salida, hora_salida, minuto_salida, duracion, valor, usuario)
+    )
+    _contar_inserciones_historial(conn)
+    
+    # Retornamos éxito y datos relevantes
+    return True, {
+        "duracion": duracion,
+        "valor": valor,
+        "tipo": tipo,
+        "entrada": f"{fecha_entrada} {hora_entrada}:{minuto_entrada:02d}",
+        "salida": f"{fecha_salida} {hora_salida}:{minuto_salida:02d}"
+    }
+
+def registrar_ingreso_batch(filas, usuario="sistema"):
+    """
+    Registra el ingreso de varios vehículos en una sola transacción.
+    
+    Pensada para cargas masivas (por ejemplo, importar los ingresos de un día
+    anterior): todas las filas válidas se insertan con un único executemany,
+    de modo que SQLite prepara la sentencia una vez y confirma una sola vez.
+    Para importaciones muy grandes conviene enviar lotes de unas 10.000 filas.
+    
+    Args:
+        filas (iterable): Tuplas (placa, fecha, hora, minuto, tipo). Si fecha, hora
+                          o minuto son None se usa la fecha y hora actual.
+        usuario (str, optional): Usuario que registra los ingresos. Por defecto 'sistema'.
+    
+    Returns:
+        tuple: (success, result)
+            - success (bool): True si la operación fue exitosa, False en caso contrario
+            - result: Si success es True, un diccionario con la cantidad de ingresos
+                      registrados, la cantidad de placas que ya estaban en el parqueadero
+                      y la lista de placas inválidas. Si es False, un mensaje de error.
+    """
+    validas = []
+    invalidas = []
+    for placa, fecha, hora, minuto, tipo in filas:
+        # Aplicamos las mismas validaciones que registrar_ingreso
+        tipo = _NORMALIZAR_TIPO.get(tipo.lower() if isinstance(tipo, str) else None)
+        if tipo is None or not validar_placa(placa):
+            invalidas.append(placa)
+            continue
+        placa = placa.strip().upper()
+        if fecha is None or hora is None or minuto is None:
+            fecha, hora, minuto = obtener_fecha_hora_actual()
+        validas.append((placa, fecha, hora, minuto, tipo, usuario))
+    
+    try:
+        # Establecemos conexión con la base de datos
+        conn = conectar()
         
-        # Eliminamos el vehículo de la tabla de vehículos activos
-        cursor.execute("DELETE FROM vehiculos WHERE placa=?", (placa,))
-        conn.commit()
+        with _transaccion(conn):
+            # Las placas repetidas se omiten gracias a ON CONFLICT
+            antes = conn.total_changes
+            conn.executemany(_SQL_INSERTAR_VEHICULO, validas)
+            registrados = conn.total_changes - antes
         
-        # Retornamos éxito y datos relevantes
         return True, {
-            "duracion": duracion,
-            "valor": valor,
-            "tipo": tipo,
-            "entrada": f"{fecha_entrada} {hora_entrada}:{minuto_entrada:02d}",
-            "salida": f"{fecha_salida} {hora_salida}:{minuto_salida:02d}"
+            "registrados": registrados,
+            "repetidos": len(validas) - registrados,
+            "invalidas": invalidas
         }
     
     except sqlite3.Error as e:
         # En caso de error en la base de datos, registramos el problema
-        print(f"Error en registrar salida: {e}")
+        log.exception("Error en registrar ingresos")
+        return False, f"Error en la base de datos: {e}"
+
+def registrar_salida_batch(salidas, usuario="sistema"):
+    """
+    Registra la salida de varios vehículos en una sola transacción.
+    
+    Cada salida se procesa igual que en registrar_salida, pero todas comparten
+    un único commit (un solo fsync). Si ocurre un error de base de datos se
+    revierte el lote completo.
+    
+    Args:
+        salidas (iterable): Tuplas (placa, fecha_salida, hora_salida, minuto_salida).
+                            Si la fecha o la hora son None se usa la fecha y hora actual.
+        usuario (str, optional): Usuario que registra las salidas. Por defecto 'sistema'.
+    
+    Returns:
+        tuple: (success, result)
+            - success (bool): True si la operación fue exitosa, False en caso contrario
+            - result: Si success es True, una lista de tuplas (placa, success, result)
+                      con el resultado de cada salida en el mismo orden recibido.
+                      Si es False, un mensaje de error.
+    """
+    try:
+        # Establecemos conexión con la base de datos
+        conn = conectar()
+        
+        resultados = []
+        with _transaccion(conn):
+            for placa, fecha_salida, hora_salida, minuto_salida in salidas:
+                if fecha_salida is None or hora_salida is None or minuto_salida is None:
+                    fecha_salida, hora_salida, minuto_salida = obtener_fecha_hora_actual()
+                exito, resultado = _procesar_salida(
+                    conn, placa, fecha_salida, hora_salida, minuto_salida, usuario
+                )
+                resultados.append((placa, exito, resultado))
+        
+        return True, resultados
+    
+    except sqlite3.Error as e:
+        # En caso de error en la base de datos, registramos el problema
+        log.exception("Error en registrar salidas")
         return False, f"Error en la base de datos: {e}"
 
 def obtener_vehiculos_activos():
@@ -450,95 +1337,181 @@ def obtener_vehiculos_activos():
               Cada tupla contiene (placa, tipo, fecha_entrada, hora_entrada, minuto_entrada)
     """
     try:
-        # Establecemos conexión con la base de datos
-        conn = conectar()
-        cursor = conn.cursor()
-        
         # Consultamos todos los vehículos activos ordenados por tiempo de entrada
-        cursor.execute("""
-            SELECT placa, tipo, fecha_entrada, hora_entrada, minuto_entrada
-            FROM vehiculos
-            ORDER BY fecha_entrada, hora_entrada, minuto_entrada
-        """)
-        return cursor.fetchall()
-    except sqlite3.Error as e:
+        with conectar_lectura() as conn:
+            return conn.execute(_SQL_VEHICULOS_ACTIVOS).fetchall()
+    except sqlite3.Error:
         # En caso de error, registramos el problema y retornamos lista vacía
-        print(f"Error al obtener vehículos activos: {e}")
+        log.exception("Error al obtener vehículos activos")
         return []
 
-def obtener_historial(filtro_placa=None, filtro_tipo=None, fecha_inicio=None, fecha_fin=None):
+def obtener_huella_datos():
+    """
+    Obtiene un resumen barato del estado de los datos.
+    
+    Sirve para saber si vale la pena volver a consultar las tablas: si la
+    huella no cambió desde la última vez, no hubo ingresos ni salidas.
+    
+    Returns:
+        tuple: (cantidad de vehículos activos, id del último registro del
+               historial), o None si ocurre un error
+    """
+    try:
+        with conectar_lectura() as conn:
+            return conn.execute(_SQL_HUELLA).fetchone()
+    except sqlite3.Error:
+        log.exception("Error al obtener la huella de los datos")
+        return None
+
+def obtener_historial(filtro_placa=None, filtro_tipo=None, fecha_inicio=None, fecha_fin=None, limit=None, offset=0):
     """
     Obtiene el historial de vehículos con opciones de filtrado.
     
     Esta función permite filtrar el historial por:
-    - Placa (parcial o completa)
+    - Placa (inicio de la placa o placa completa)
     - Tipo de vehículo
     - Rango de fechas
     
     Args:
-        filtro_placa (str, optional): Filtro por placa (parcial o completa)
+        filtro_placa (str, optional): Filtro por placa (inicio de la placa o completa)
         filtro_tipo (str, optional): Filtro por tipo ('Carro' o 'Moto')
         fecha_inicio (str, optional): Fecha inicial para filtrar (formato 'YYYY-MM-DD')
         fecha_fin (str, optional): Fecha final para filtrar (formato 'YYYY-MM-DD')
+        limit (int, optional): Cantidad máxima de registros a retornar (para paginar)
+        offset (int, optional): Cantidad de registros a saltar cuando se usa limit
     
     Returns:
         list: Lista de tuplas con información del historial filtrado
     """
     try:
-        # Establecemos conexión con la base de datos
-        conn = conectar()
-        cursor = conn.cursor()
-        
-        # Construimos la consulta base
-        query = """
-            SELECT placa, tipo, fecha_entrada, hora_entrada, minuto_entrada,
-                   fecha_salida, hora_salida, minuto_salida, duracion_horas, valor_pagado
-            FROM historial
-            WHERE 1=1
-        """
-        params = []
-        
-        # Añadimos filtros si se proporcionan
-        if filtro_placa:
-            query += " AND placa LIKE ?"
-            params.append(f"%{filtro_placa}%")
-        
-        if filtro_tipo:
-            query += " AND tipo = ?"
-            params.append(filtro_tipo)
-        
-        if fecha_inicio:
-            query += " AND fecha_entrada >= ?"
-            params.append(fecha_inicio)
-        
-        if fecha_fin:
-            query += " AND fecha_entrada <= ?"
-            params.append(fecha_fin)
-        
-        # Ordenamos por fecha de registro descendente (más recientes primero)
-        query += " ORDER BY fecha_registro DESC"
-        
-        cursor.execute(query, params)
-        return cursor.fetchall()
+        with conectar_lectura() as conn:
+            return _consultar_historial(
+                conn, filtro_placa, filtro_tipo, fecha_inicio, fecha_fin, limit, offset
+            ).fetchall()
     
-    except sqlite3.Error as e:
+    except sqlite3.Error:
         # En caso de error, registramos el problema y retornamos lista vacía
-        print(f"Error en obtener historial: {e}")
+        log.exception("Error en obtener historial")
         return []
 
-def exportar_historial_csv(ruta="historial_parqueadero.csv", filtro_placa=None, filtro_tipo=None, fecha_inicio=None, fecha_fin=None):
+def contar_historial(filtro_placa=None, filtro_tipo=None, fecha_inicio=None, fecha_fin=None):
+    """
+    Cuenta los registros del historial que cumplen los filtros.
+    
+    Acompaña a obtener_historial cuando se pagina con limit/offset: permite
+    mostrar el total sin traer todas las filas.
+    
+    Args:
+        filtro_placa (str, optional): Filtro por placa (inicio de la placa o completa)
+        filtro_tipo (str, optional): Filtro por tipo ('Carro' o 'Moto')
+        fecha_inicio (str, optional): Fecha inicial para filtrar (formato 'YYYY-MM-DD')
+        fecha_fin (str, optional): Fecha final para filtrar (formato 'YYYY-MM-DD')
+    
+    Returns:
+        int: Cantidad de registros (0 si ocurre un error)
+    """
+    try:
+        with conectar_lectura() as conn:
+            return _consultar_historial(
+                conn, filtro_placa, filtro_tipo, fecha_inicio, fecha_fin,
+                None, 0, None, _COLUMNAS_CONTEO
+            ).fetchone()[0]
+    
+    except sqlite3.Error:
+        # En caso de error, registramos el problema y retornamos cero
+        log.exception("Error al contar el historial")
+        return 0
+
+def iterar_historial(filtro_placa=None, filtro_tipo=None, fecha_inicio=None, fecha_fin=None, limit=None, offset=0, rango_id=None):
+    """
+    Recorre el historial filtrado fila por fila, sin cargarlo completo en memoria.
+    
+    Recibe los mismos filtros que obtener_historial, pero en lugar de una lista
+    retorna un generador que lee directamente del cursor de SQLite. Es la forma
+    adecuada de recorrer historiales grandes (por ejemplo, al exportar).
+    A diferencia de obtener_historial, los errores de base de datos se propagan
+    al consumidor.
+    
+    Args:
+        rango_id (tuple, optional): (desde, hasta) para recorrer solo los registros
+            con desde < id <= hasta, en orden de inserción
+    
+    Yields:
+        tuple: Una fila del historial con el mismo formato que obtener_historial
+    """
+    yield from _iterar_historial(
+        filtro_placa, filtro_tipo, fecha_inicio, fecha_fin, limit, offset, rango_id
+    )
+
+def _iterar_historial(filtro_placa, filtro_tipo, fecha_inicio, fecha_fin, limit, offset, rango_id, columnas=_COLUMNAS_HISTORIAL):
+    """
+    Recorre la consulta filtrada del historial con una conexión de lectura.
+    
+    La conexión queda prestada mientras se recorre el generador y se devuelve
+    al terminarlo (o al descartarlo).
+    
+    Yields:
+        tuple: Una fila del historial con las columnas indicadas
+    """
+    with conectar_lectura() as conn:
+        yield from _consultar_historial(
+            conn, filtro_placa, filtro_tipo, fecha_inicio, fecha_fin, limit, offset, rango_id, columnas
+        )
+
+def _consultar_historial(conn, filtro_placa, filtro_tipo, fecha_inicio, fecha_fin, limit, offset, rango_id=None, columnas=_COLUMNAS_HISTORIAL):
+    """
+    Ejecuta la consulta filtrada del historial.
+    
+    Args:
+        columnas (str, optional): Lista de columnas del SELECT (por defecto las
+            de obtener_historial; _COLUMNAS_EXPORTACION para exportar)
+    
+    Returns:
+        sqlite3.Cursor: Cursor posicionado antes de la primera fila
+    """
+    # Elegimos la consulta ya armada para esta combinación de filtros
+    query = _SQL_HISTORIAL[(
+        columnas, bool(filtro_placa), bool(filtro_tipo), bool(fecha_inicio), bool(fecha_fin),
+        rango_id is not None, limit is not None
+    )]
+    
+    # Parámetros en el mismo orden que los marcadores de la consulta
+    # La placa se busca por prefijo ('ABC%'): sin comodín al inicio, SQLite
+    # recorre solo el tramo correspondiente de idx_historial_placa
+    params = [
+        valor for valor in (filtro_placa and f"{filtro_placa}%", filtro_tipo, fecha_inicio, fecha_fin)
+        if valor
+    ]
+    if rango_id is not None:
+        params.extend(rango_id)
+    if limit is not None:
+        params.extend((limit, offset))
+    
+    return conn.execute(query, params)
+
+def exportar_historial_csv(ruta="historial_parqueadero.csv", filtro_placa=None, filtro_tipo=None, fecha_inicio=None, fecha_fin=None, incremental=False, progreso=None):
     """
     Exporta el historial a un archivo CSV con opciones de filtrado.
     
     Esta función permite exportar el historial filtrado a un archivo CSV,
     ideal para análisis en hojas de cálculo o importación a otros sistemas.
     
+    En modo incremental solo se agregan al final del archivo los registros
+    creados después de la exportación anterior, en orden de inserción. El
+    último id exportado se guarda en '<ruta>.watermark' junto con los filtros
+    usados; si no existe (o no existe el CSV, o los filtros son otros) el
+    archivo se escribe completo. Una exportación completa (no incremental)
+    borra la marca, porque reescribe el archivo.
+    
     Args:
         ruta (str, optional): Ruta del archivo CSV a generar
-        filtro_placa (str, optional): Filtro por placa (parcial o completa)
+        filtro_placa (str, optional): Filtro por placa (inicio de la placa o completa)
         filtro_tipo (str, optional): Filtro por tipo ('Carro' o 'Moto')
         fecha_inicio (str, optional): Fecha inicial para filtrar (formato 'YYYY-MM-DD')
         fecha_fin (str, optional): Fecha final para filtrar (formato 'YYYY-MM-DD')
+        incremental (bool, optional): Si es True, agrega solo los registros nuevos
+        progreso (callable, optional): Función que recibe el número de filas
+            escritas hasta el momento; se llama cada LOTE_EXPORTACION filas
     
     Returns:
         tuple: (success, message)
@@ -546,44 +1519,182 @@ def exportar_historial_csv(ruta="historial_parqueadero.csv", filtro_placa=None,
             - message (str): Mensaje descriptivo del resultado
     """
     try:
-        # Obtenemos el historial filtrado
-        historial = obtener_historial(filtro_placa, filtro_tipo, fecha_inicio, fecha_fin)
-        if not historial:
+        rango_id = None
+        anexar = False
+        if incremental:
+            # Exportamos hasta el último id existente ahora mismo; lo que se
+            # registre durante la exportación queda para la siguiente
+            marca = _leer_marca_exportacion(ruta, (filtro_placa, filtro_tipo, fecha_inicio, fecha_fin))
+            with conectar_lectura() as conn:
+                tope = conn.execute("SELECT COALESCE(MAX(id), 0) FROM historial").fetchone()[0]
+            rango_id = (marca, tope)
+            anexar = marca > 0
+        
+        # Recorremos el historial filtrado directamente desde el cursor,
+        # sin materializarlo en una lista; las filas llegan ya formateadas
+        historial = _iterar_historial(
+            filtro_placa, filtro_tipo, fecha_inicio, fecha_fin,
+            None, 0, rango_id, _COLUMNAS_EXPORTACION
+        )
+        primera = next(historial, None)
+        if primera is None:
+            if anexar:
+                return True, f"No hay registros nuevos para exportar a '{ruta}'"
             return False, "No hay datos para exportar"
         
-        # Creamos el archivo CSV
-        with open(ruta, mode="w", newline="", encoding="utf-8") as archivo:
+        # Creamos el archivo CSV (o lo abrimos para agregar al final)
+        modo = "a" if anexar else "w"
+        with open(ruta, mode=modo, newline="", encoding="utf-8", buffering=BUFFER_EXPORTACION) as archivo:
             writer = csv.writer(archivo)
             
             # Escribimos la cabecera
-            writer.writerow([
-                "Placa", "Tipo", "Fecha Entrada", "Hora Entrada", 
-                "Fecha Salida", "Hora Salida", "Duración (horas)", "Valor"
-            ])
+            if not anexar:
+                writer.writerow(_ENCABEZADOS_EXPORTACION)
             
-            # Escribimos los datos
-            for fila in historial:
-                placa, tipo, fecha_entrada, hora_entrada, minuto_entrada, \
-                fecha_salida, hora_salida, minuto_salida, duracion, valor = fila
-                
-                # Formateamos las horas para mejor legibilidad
-                entrada_str = f"{fecha_entrada} {hora_entrada}:{minuto_entrada:02d}"
-                salida_str = f"{fecha_salida} {hora_salida}:{minuto_salida:02d}" if fecha_salida else "N/A"
-                
-                writer.writerow([
-                    placa, tipo, fecha_entrada, f"{hora_entrada}:{minuto_entrada:02d}",
-                    fecha_salida, f"{hora_salida}:{minuto_salida:02d}" if fecha_salida else "N/A",
-                    duracion, valor
-                ])
+            # Escribimos los datos (la primera fila ya fue leída del cursor)
+            filas = itertools.chain((primera,), historial)
+            if progreso is None:
+                # writerows consume el cursor completo en una sola llamada
+                writer.writerows(filas)
+            else:
+                # Por lotes, avisando el avance después de cada uno; solo se
+                # guarda en memoria un lote a la vez
+                escritas = 0
+                while True:
+                    lote = list(itertools.islice(filas, LOTE_EXPORTACION))
+                    if not lote:
+                        break
+                    writer.writerows(lote)
+                    escritas += len(lote)
+                    progreso(escritas)
+        
+        if incremental:
+            _guardar_marca_exportacion(ruta, rango_id[1], (filtro_placa, filtro_tipo, fecha_inicio, fecha_fin))
+        else:
+            # El archivo se reescribió completo: una marca anterior ya no vale
+            _borrar_marca_exportacion(ruta)
         
         return True, f"Historial exportado a '{ruta}'"
     
     except Exception as e:
         # En caso de error, registramos el problema
-        print(f"Error al exportar CSV: {e}")
+        log.exception("Error al exportar CSV")
+        return False, f"Error al exportar: {e}"
+
+def exportar_historial_csv_rapido(ruta="historial_parqueadero.csv"):
+    """
+    Exporta el historial completo a CSV usando el programa de línea de comandos sqlite3.
+    
+    SQLite escribe el archivo directamente, sin que las filas pasen por Python,
+    lo que es bastante más rápido para historiales grandes. No admite filtros.
+    Si el programa sqlite3 no está instalado, o la base está en memoria (el
+    programa no puede abrirla), usa exportar_historial_csv.
+    
+    Args:
+        ruta (str, optional): Ruta del archivo CSV a generar
+    
+    Returns:
+        tuple: (success, message)
+            - success (bool): True si la operación fue exitosa, False en caso contrario
+            - message (str): Mensaje descriptivo del resultado
+    """
+    programa = shutil.which("sqlite3")
+    if programa is None or str(DB_PATH) == ":memory:":
+        return exportar_historial_csv(ruta)
+    
+    try:
+        # Comprobamos que haya datos (y que el esquema esté creado) antes de exportar
+        with conectar_lectura() as conn:
+            if conn.execute("SELECT 1 FROM historial LIMIT 1").fetchone() is None:
+                return False, "No hay datos para exportar"
+        
+        # La cabecera la escribe Python: el programa sqlite3 pone entre comillas
+        # los nombres con espacios o tildes, y csv.writer no
+        with open(ruta, mode="w", newline="", encoding="utf-8") as archivo:
+            csv.writer(archivo).writerow(_ENCABEZADOS_EXPORTACION)
+        
+        # Las filas las escribe el programa a continuación, por su salida
+        # estándar; así la ruta no pasa por un comando del programa (donde un
+        # apóstrofo en el nombre del archivo rompería el comando .output)
+        with open(ruta, mode="ab") as archivo:
+            resultado = subprocess.run(
+                [programa, "-readonly", str(DB_PATH),
+                 ".headers off", ".mode csv", _SQL_EXPORTAR_CSV],
+                stdout=archivo, stderr=subprocess.PIPE, text=True
+            )
+        if resultado.returncode != 0 or resultado.stderr:
+            log.error("Error al exportar CSV: %s", resultado.stderr.strip())
+            return False, f"Error al exportar: {resultado.stderr.strip()}"
+        
+        # El archivo se reescribió completo: una marca incremental anterior ya no vale
+        _borrar_marca_exportacion(ruta)
+        
+        return True, f"Historial exportado a '{ruta}'"
+    
+    except (sqlite3.Error, OSError) as e:
+        # En caso de error, registramos el problema
+        log.exception("Error al exportar CSV")
         return False, f"Error al exportar: {e}"
 
-def exportar_historial_excel(ruta="historial_parqueadero.xlsx", filtro_placa=None, filtro_tipo=None, fecha_inicio=None, fecha_fin=None):
+def _clave_filtros(filtros):
+    """
+    Arma el texto que identifica los filtros de una exportación incremental.
+    
+    Args:
+        filtros (tuple): (filtro_placa, filtro_tipo, fecha_inicio, fecha_fin)
+    
+    Returns:
+        str: Filtros separados por '|' (vacío donde no hay filtro)
+    """
+    return "|".join(valor or "" for valor in filtros)
+
+def _leer_marca_exportacion(ruta, filtros):
+    """
+    Lee el último id exportado de forma incremental a un archivo CSV.
+    
+    La marca solo vale para los mismos filtros con que se escribió: con otros
+    filtros el archivo tiene otras filas y hay que reescribirlo completo.
+    
+    Args:
+        ruta (str): Ruta del archivo CSV
+        filtros (tuple): (filtro_placa, filtro_tipo, fecha_inicio, fecha_fin)
+    
+    Returns:
+        int: Último id exportado, o 0 si el CSV o su marca no existen, o si la
+             marca corresponde a otros filtros
+    """
+    marca = Path(f"{ruta}.watermark")
+    if not Path(ruta).exists() or not marca.exists():
+        return 0
+    lineas = marca.read_text(encoding="utf-8").split("\n")
+    if len(lineas) != 2 or lineas[1] != _clave_filtros(filtros):
+        return 0
+    try:
+        return int(lineas[0])
+    except ValueError:
+        return 0
+
+def _guardar_marca_exportacion(ruta, ultimo_id, filtros):
+    """
+    Guarda el último id exportado de forma incremental a un archivo CSV.
+    
+    Args:
+        ruta (str): Ruta del archivo CSV
+        ultimo_id (int): Id del último registro exportado
+        filtros (tuple): Filtros con que se exportó
+    """
+    Path(f"{ruta}.watermark").write_text(f"{ultimo_id}\n{_clave_filtros(filtros)}", encoding="utf-8")
+
+def _borrar_marca_exportacion(ruta):
+    """
+    Borra la marca de exportación incremental de un archivo CSV, si existe.
+    
+    Args:
+        ruta (str): Ruta del archivo CSV
+    """
+    Path(f"{ruta}.watermark").unlink(missing_ok=True)
+
+def exportar_historial_excel(ruta="historial_parqueadero.xlsx", filtro_placa=None, filtro_tipo=None, fecha_inicio=None, fecha_fin=None, progreso=None):
     """
     Exporta el historial a un archivo Excel con opciones de filtrado.
     
@@ -592,10 +1703,12 @@ def exportar_historial_excel(ruta="historial_parqueadero.xlsx", filtro_placa=Non
     
     Args:
         ruta (str, optional): Ruta del archivo Excel a generar
-        filtro_placa (str, optional): Filtro por placa (parcial o completa)
+        filtro_placa (str, optional): Filtro por placa (inicio de la placa o completa)
         filtro_tipo (str, optional): Filtro por tipo ('Carro' o 'Moto')
         fecha_inicio (str, optional): Fecha inicial para filtrar (formato 'YYYY-MM-DD')
         fecha_fin (str, optional): Fecha final para filtrar (formato 'YYYY-MM-DD')
+        progreso (callable, optional): Función que recibe el número de filas
+            escritas hasta el momento; se llama cada LOTE_EXPORTACION filas
     
     Returns:
         tuple: (success, message)
@@ -605,17 +1718,23 @@ def exportar_historial_excel(ruta="historial_parqueadero.xlsx", filtro_placa=Non
     try:
         # Importamos openpyxl solo cuando se necesita
         import openpyxl
+        from openpyxl.cell import WriteOnlyCell
         from openpyxl.styles import Font, Alignment, PatternFill
+        from openpyxl.utils import get_column_letter
         
-        # Obtenemos el historial filtrado
-        historial = obtener_historial(filtro_placa, filtro_tipo, fecha_inicio, fecha_fin)
-        if not historial:
+        # Largo máximo de cada columna del historial filtrado, calculado por SQLite
+        # (sin registros, todos los máximos son NULL)
+        largos = next(_iterar_historial(
+            filtro_placa, filtro_tipo, fecha_inicio, fecha_fin,
+            None, 0, None, _COLUMNAS_EXCEL_ANCHOS
+        ))
+        if largos[0] is None:
             return False, "No hay datos para exportar"
         
-        # Creamos un nuevo libro y hoja
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Historial Parqueadero"
+        # Creamos un libro en modo de solo escritura: cada fila se escribe
+        # directamente al archivo en lugar de guardarse en memoria
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("Historial Parqueadero")
         
         # Añadimos encabezados
         headers = [
@@ -623,45 +1742,42 @@ def exportar_historial_excel(ruta="historial_parqueadero.xlsx", filtro_placa=Non
             "Fecha Salida", "Hora Salida", "Duración (horas)", "Valor"
         ]
         
+        # Ajustamos anchos de columna (en este modo, antes de escribir la primera fila)
+        for col_num, (header, largo) in enumerate(zip(headers, largos), 1):
+            ws.column_dimensions[get_column_letter(col_num)].width = max(len(header), largo or 0) + 2
+        
         # Estilo para encabezados
         header_font = Font(bold=True, color="FFFFFF")
         header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
         centered = Alignment(horizontal="center")
         
+        alineado_derecha = Alignment(horizontal="right")
+        
         # Aplicamos encabezados con estilo
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
+        encabezados = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
             cell.font = header_font
             cell.fill = header_fill
             cell.alignment = centered
+            encabezados.append(cell)
+        ws.append(encabezados)
         
-        # Añadimos datos
-        for row_num, fila in enumerate(historial, 2):
-            placa, tipo, fecha_entrada, hora_entrada, minuto_entrada, \
-            fecha_salida, hora_salida, minuto_salida, duracion, valor = fila
-            
-            ws.cell(row=row_num, column=1, value=placa)
-            ws.cell(row=row_num, column=2, value=tipo)
-            ws.cell(row=row_num, column=3, value=fecha_entrada)
-            ws.cell(row=row_num, column=4, value=f"{hora_entrada}:{minuto_entrada:02d}")
-            ws.cell(row=row_num, column=5, value=fecha_salida if fecha_salida else "N/A")
-            ws.cell(row=row_num, column=6, value=f"{hora_salida}:{minuto_salida:02d}" if fecha_salida else "N/A")
-            ws.cell(row=row_num, column=7, value=duracion)
-            
+        # Añadimos datos desde el cursor, con las horas ya formateadas por SQLite
+        # (igual que la exportación CSV)
+        for escritas, fila in enumerate(_iterar_historial(
+            filtro_placa, filtro_tipo, fecha_inicio, fecha_fin,
+            None, 0, None, _COLUMNAS_EXCEL
+        ), 1):
             # Formato para el valor
-            cell = ws.cell(row=row_num, column=8, value=valor)
+            cell = WriteOnlyCell(ws, value=fila[7])
             cell.number_format = "$#,##0"
-            cell.alignment = Alignment(horizontal="right")
-        
-        # Ajustamos anchos de columna
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            adjusted_width = (max_length + 2)
-            ws.column_dimensions[column].width = adjusted_width
+            cell.alignment = alineado_derecha
+            ws.append((*fila[:7], cell))
+            
+            # Avisamos el avance después de cada lote
+            if progreso is not None and escritas % LOTE_EXPORTACION == 0:
+                progreso(escritas)
         
         # Guardamos el archivo
         wb.save(ruta)
@@ -669,9 +1785,50 @@ def exportar_historial_excel(ruta="historial_parqueadero.xlsx", filtro_placa=Non
     
     except Exception as e:
         # En caso de error, registramos el problema
-        print(f"Error al exportar Excel: {e}")
+        log.exception("Error al exportar Excel")
         return False, f"Error al exportar: {e}"
 
+def realizar_backup():
+    """
+    Crea una copia de seguridad de la base de datos en data/backups.
+    
+    La carpeta 'backups' se crea junto al archivo de la base (DB_PATH); con
+    una base en memoria (':memory:') se usa data/backups.
+    
+    Usa la API de respaldo en línea de SQLite (Connection.backup) en lugar de
+    copiar el archivo: la copia es consistente aunque haya cambios aún en el
+    registro WAL, y se hace por pasos sin detener las demás operaciones.
+    
+    Returns:
+        tuple: (success, message)
+            - success (bool): True si la operación fue exitosa, False en caso contrario
+            - message (str): Ruta de la copia creada o descripción del error
+    """
+    try:
+        # Creamos el directorio de copias junto a la base de datos; una base
+        # en memoria no tiene carpeta propia
+        if str(DB_PATH) == ":memory:":
+            carpeta = Path("data") / "backups"
+        else:
+            carpeta = Path(DB_PATH).parent / "backups"
+        carpeta.mkdir(parents=True, exist_ok=True)
+        destino = carpeta / f"parking_backup_{datetime.now():%Y%m%d_%H%M%S}.db"
+        
+        # Copiamos desde una conexión de lectura para no ocupar la de escritura
+        with conectar_lectura() as conn:
+            copia = sqlite3.connect(destino)
+            try:
+                conn.backup(copia, pages=PAGINAS_POR_PASO_BACKUP)
+            finally:
+                copia.close()
+        
+        return True, f"Copia de seguridad creada en '{destino}'"
+    
+    except (sqlite3.Error, OSError) as e:
+        # En caso de error, registramos el problema
+        log.exception("Error al crear copia de seguridad")
+        return False, f"Error al crear copia de seguridad: {e}"
+
 # Función para migración de datos antiguos (si es necesario)
 def migrar_datos_antiguos():
     """
@@ -686,73 +1843,61 @@ def migrar_datos_antiguos():
     try:
         # Establecemos conexión con la base de datos
         conn = conectar()
-        cursor = conn.cursor()
         
         # Verificamos si existe la tabla historial antigua (sin campos de fecha)
-        cursor.execute("""
+        antigua = conn.execute("""
             SELECT name FROM sqlite_master 
             WHERE type='table' AND name='historial' AND 
             sql NOT LIKE '%fecha_entrada%'
-        """)
+        """).fetchone()
         
-        if cursor.fetchone():
+        if antigua:
             # La tabla existe en formato antiguo, necesitamos migrar
-            print("Migrando datos antiguos...")
+            log.info("Migrando datos antiguos...")
             
             # Obtenemos los datos antiguos
-            cursor.execute("""
+            registros_antiguos = conn.execute("""
                 SELECT placa, tipo, hora_entrada, hora_salida, duracion, valor_pagado
                 FROM historial
-            """)
-            registros_antiguos = cursor.fetchall()
-            
-            # Renombramos la tabla antigua
-            conn.execute("ALTER TABLE historial RENAME TO historial_old")
-            
-            # Creamos la nueva tabla con el esquema actualizado
-            conn.execute('''
-                CREATE TABLE historial (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    placa TEXT,
-                    tipo TEXT,
-                    fecha_entrada TEXT,
-                    hora_entrada INTEGER,
-                    minuto_entrada INTEGER,
-                    fecha_salida TEXT,
-                    hora_salida INTEGER,
-                    minuto_salida INTEGER,
-                    duracion_horas REAL,
-                    valor_pagado REAL,
-                    usuario_registro TEXT,
-                    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            """).fetchall()
             
             # Fecha actual para los registros migrados
             fecha_actual = date.today().strftime("%Y-%m-%d")
             
-            # Insertamos los datos antiguos en la nueva tabla
-            for placa, tipo, hora_entrada, hora_salida, duracion, valor_pagado in registros_antiguos:
-                conn.execute(
-                    """
-                    INSERT INTO historial 
-                    (placa, tipo, fecha_entrada, hora_entrada, minuto_entrada, 
-                     fecha_salida, hora_salida, minuto_salida, duracion_horas, valor_pagado, usuario_registro)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (placa, tipo, fecha_actual, hora_entrada, 0, 
-                     fecha_actual, hora_salida, 0, duracion, valor_pagado, "migración")
+            # Todo el cambio ocurre en una sola transacción: si algo falla,
+            # la tabla antigua queda intacta
+            with _bloqueo_escritura, conn:
+                # BEGIN explícito: las sentencias DDL no abren transacción por sí solas
+                conn.execute("BEGIN")
+                
+                # Renombramos la tabla antigua
+                conn.execute("ALTER TABLE historial RENAME TO historial_old")
+                
+                # Creamos la nueva tabla con el esquema actualizado
+                conn.execute(_DDL_HISTORIAL.format(tabla="historial"))
+                
+                # Insertamos los datos antiguos en la nueva tabla con un único executemany
+                conn.executemany(
+                    _SQL_INSERTAR_HISTORIAL,
+                    (
+                        (placa, tipo, fecha_actual, hora_entrada, 0, 
+                         fecha_actual, hora_salida, 0, duracion, valor_pagado, "migración")
+                        for placa, tipo, hora_entrada, hora_salida, duracion, valor_pagado in registros_antiguos
+                    )
                 )
+                _contar_inserciones_historial(conn, len(registros_antiguos))
             
-            conn.commit()
-            print(f"Migración completada: {len(registros_antiguos)} registros")
+            # Ahora que la tabla tiene el formato actual, creamos sus índices
+            with _bloqueo_escritura:
+                conn.executescript(_ESQUEMA_INDICES_HISTORIAL)
+            log.info("Migración completada: %d registros", len(registros_antiguos))
             return True
         
         return False  # No era necesario migrar
     
-    except sqlite3.Error as e:
+    except sqlite3.Error:
         # En caso de error, registramos el problema
-        print(f"Error en migración: {e}")
+        log.exception("Error en migración")
         return False
 
 
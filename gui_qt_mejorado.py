@@ -10,10 +10,12 @@ para gestionar ingresos, salidas, vehículos activos e historial.
 
 # Importación de módulos de PyQt5 para la interfaz gráfica
 from PyQt5.QtWidgets import (QMainWindow, QTabWidget, QWidget, QVBoxLayout, QHBoxLayout,
-                            QLabel, QLineEdit, QPushButton, QComboBox, QTableWidget, QTableWidgetItem,
-                            QHeaderView, QMessageBox, QFileDialog, QDateEdit, QTimeEdit, QGroupBox,
-                            QFormLayout, QCheckBox, QStatusBar)
-from PyQt5.QtCore import Qt, QDate, QTime, QRegExp, QTimer
+                            QLabel, QLineEdit, QPushButton, QComboBox,
+                            QTableView, QAbstractItemView, QHeaderView, QMessageBox, QFileDialog,
+                            QDateEdit, QTimeEdit, QGroupBox, QFormLayout, QCheckBox, QStatusBar,
+                            QApplication, QStyle, QStyleOptionButton, QStyledItemDelegate)
+from PyQt5.QtCore import (Qt, QDate, QTime, QRegExp, QTimer, QAbstractTableModel, QModelIndex,
+                          QObject, QRunnable, QThreadPool, QEvent, pyqtSignal)
 from PyQt5.QtGui import QRegExpValidator, QFont
 
 # Importación del módulo de base de datos
@@ -22,11 +24,482 @@ import database_mejorado as db
 # Importación de módulos estándar
 import sys
 import os
+import logging
 from datetime import datetime
 
+log = logging.getLogger("parking.gui")
+
 # Definimos la ruta para los iconos
 ICON_PATH = "icons"
 
+# Posición de la pestaña de historial en el sistema de pestañas
+PESTANA_HISTORIAL = 3
+
+# Filas del historial que se traen por consulta; las siguientes páginas se
+# piden a medida que el usuario se desplaza hacia abajo en la tabla
+FILAS_POR_PAGINA = 200
+
+# Validador para formato de placa (3 letras seguidas de 2 o 3 números); se
+# crea una sola vez y lo comparten los campos de placa
+VALIDADOR_PLACA = QRegExpValidator(QRegExp("[A-Za-z]{3}[0-9]{2,3}"))
+
+class SenalesTarea(QObject):
+    """
+    Señales de TareaBD.
+    
+    QRunnable no es un QObject y no puede emitir señales por sí mismo, así que
+    cada tarea lleva uno de estos objetos para avisar cuando termina.
+    """
+    # Emite (etiqueta, resultado) al terminar la tarea; si la función lanzó
+    # una excepción, el resultado es esa excepción
+    terminado = pyqtSignal(object, object)
+    
+    # Avance de tareas largas (por ejemplo, filas exportadas)
+    progreso = pyqtSignal(int)
+
+class TareaBD(QRunnable):
+    """
+    Ejecuta una función del módulo de base de datos en un hilo de QThreadPool.
+    
+    Así las consultas no congelan la interfaz mientras SQLite trabaja. El
+    resultado llega al hilo principal mediante la señal senales.terminado,
+    que debe conectarse a un método de la ventana (Qt lo entrega en el hilo
+    del objeto receptor, donde sí se pueden modificar los widgets).
+    
+    Si la función lanza una excepción, se registra y se emite la excepción
+    como resultado, para que el receptor no quede esperando para siempre.
+    """
+    
+    def __init__(self, etiqueta, funcion, *args, **kwargs):
+        """
+        Prepara la tarea.
+        
+        Args:
+            etiqueta: Valor que acompaña al resultado (por ejemplo, un número
+                de consulta para descartar respuestas viejas)
+            funcion (callable): Función a ejecutar en segundo plano
+            *args: Argumentos para la función
+            **kwargs: Argumentos con nombre para la función
+        """
+        super().__init__()
+        self.etiqueta = etiqueta
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.senales = SenalesTarea()
+    
+    def run(self):
+        """Ejecuta la función en el hilo de trabajo y emite su resultado."""
+        try:
+            resultado = self.funcion(*self.args, **self.kwargs)
+        except Exception as e:
+            log.exception("Error en tarea de segundo plano")
+            resultado = e
+        self.senales.terminado.emit(self.etiqueta, resultado)
+
+class ActivosModel(QAbstractTableModel):
+    """
+    Modelo de datos de la tabla de vehículos activos.
+    
+    Guarda las filas tal como las retorna db.obtener_vehiculos_activos() y
+    arma el texto de cada celda solo cuando la vista lo pide. La última
+    columna ("Acciones") no tiene texto: allí la vista muestra el botón para
+    registrar la salida.
+    """
+    
+    # Encabezados de las columnas de la tabla
+    ENCABEZADOS = ["Placa", "Tipo", "Fecha Entrada", "Hora Entrada", "Acciones"]
+    
+    # Columna donde va el botón de salida
+    COLUMNA_ACCIONES = 4
+    
+    def __init__(self, parent=None):
+        """
+        Inicializa el modelo sin filas.
+        
+        Args:
+            parent (QObject, optional): Objeto padre del modelo
+        """
+        super().__init__(parent)
+        self._filas = []
+    
+    def actualizar(self, filas):
+        """
+        Reemplaza las filas del modelo.
+        
+        Args:
+            filas (list): Lista de tuplas retornada por db.obtener_vehiculos_activos()
+        """
+        self.beginResetModel()
+        self._filas = filas
+        self.endResetModel()
+    
+    def placa(self, fila):
+        """
+        Retorna la placa del vehículo de una fila.
+        
+        Args:
+            fila (int): Número de fila en la tabla
+        
+        Returns:
+            str: Placa del vehículo
+        """
+        return self._filas[fila][0]
+    
+    def rowCount(self, parent=QModelIndex()):
+        """Retorna el número de filas (el modelo es una tabla plana, sin hijos)."""
+        return 0 if parent.isValid() else len(self._filas)
+    
+    def columnCount(self, parent=QModelIndex()):
+        """Retorna el número de columnas de la tabla."""
+        return 0 if parent.isValid() else len(self.ENCABEZADOS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """Retorna el texto de los encabezados de columna."""
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.ENCABEZADOS[section]
+        return super().headerData(section, orientation, role)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        """
+        Retorna el texto de una celda.
+        
+        Args:
+            index (QModelIndex): Celda consultada
+            role (int): Rol de Qt; solo se atiende el texto a mostrar
+        
+        Returns:
+            str: Texto de la celda, o None si el rol o la columna no aplican
+        """
+        if role != Qt.DisplayRole:
+            return None
+        
+        placa, tipo, fecha_entrada, hora_entrada, minuto_entrada = self._filas[index.row()]
+        columna = index.column()
+        if columna == 0:
+            return placa
+        if columna == 1:
+            return tipo
+        if columna == 2:
+            return fecha_entrada
+        if columna == 3:
+            return f"{hora_entrada}:{minuto_entrada:02d}"
+        return None
+
+class BotonSalidaDelegate(QStyledItemDelegate):
+    """
+    Dibuja el botón "Registrar Salida" en la columna de acciones de la tabla
+    de vehículos activos.
+    
+    En lugar de crear un QPushButton por cada vehículo, el delegado pinta la
+    apariencia de un botón en cada celda de esa columna y atiende los clics
+    del mouse sobre ella. Al hacer clic emite la señal salida_pedida con la
+    placa de la fila.
+    """
+    
+    # Emite la placa del vehículo cuyo botón se pulsó
+    salida_pedida = pyqtSignal(str)
+    
+    # Texto del botón
+    TEXTO = "Registrar Salida"
+    
+    def __init__(self, vista):
+        """
+        Inicializa el delegado.
+        
+        Args:
+            vista (QTableView): Tabla donde se usa el delegado (queda como su padre)
+        """
+        super().__init__(vista)
+        self._vista = vista
+        # Fila cuyo botón está presionado (para dibujarlo hundido)
+        self._presionada = None
+        # Los clics que terminan fuera de la columna del botón no llegan a
+        # editorEvent; los vemos en la tabla para soltar el botón igualmente
+        vista.viewport().installEventFilter(self)
+    
+    def _soltar(self):
+        """Suelta el botón presionado, si lo hay, y lo vuelve a dibujar."""
+        if self._presionada is not None:
+            self._presionada = None
+            self._vista.viewport().update()
+    
+    def paint(self, painter, option, index):
+        """Dibuja el botón dentro de la celda."""
+        boton = QStyleOptionButton()
+        boton.rect = option.rect.adjusted(2, 2, -2, -2)
+        boton.text = self.TEXTO
+        boton.state = QStyle.State_Enabled
+        if index.row() == self._presionada:
+            boton.state |= QStyle.State_Sunken
+        else:
+            boton.state |= QStyle.State_Raised
+        
+        estilo = option.widget.style() if option.widget else QApplication.style()
+        estilo.drawControl(QStyle.CE_PushButton, boton, painter, option.widget)
+    
+    def editorEvent(self, event, model, option, index):
+        """
+        Atiende los clics sobre el botón.
+        
+        La salida se pide al soltar el botón del mouse dentro de la misma
+        celda donde se presionó, igual que con un QPushButton.
+        
+        Returns:
+            bool: True si el evento fue atendido por el delegado
+        """
+        if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            self._presionada = index.row()
+            self._vista.viewport().update(option.rect)
+            return True
+        
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            presionada = self._presionada
+            self._soltar()
+            if presionada == index.row() and option.rect.contains(event.pos()):
+                self.salida_pedida.emit(model.placa(index.row()))
+            return True
+        
+        return super().editorEvent(event, model, option, index)
+    
+    def eventFilter(self, objeto, event):
+        """
+        Suelta el botón cuando el mouse se suelta fuera de su columna o sale
+        de la tabla.
+        
+        Returns:
+            bool: Siempre False: el evento sigue su curso normal
+        """
+        if event.type() == QEvent.Leave:
+            self._soltar()
+        elif event.type() == QEvent.MouseButtonRelease:
+            # Dentro de la columna del botón lo atiende editorEvent
+            if self._vista.itemDelegate(self._vista.indexAt(event.pos())) is not self:
+                self._soltar()
+        return False
+
+class HistorialModel(QAbstractTableModel):
+    """
+    Modelo de datos de la tabla de historial.
+    
+    Guarda las filas tal como las retorna db.obtener_historial() y arma el
+    texto de cada celda solo cuando la vista lo pide, es decir, únicamente
+    para las celdas visibles. A diferencia de QTableWidget, no se crea un
+    objeto QTableWidgetItem por cada celda del historial.
+    
+    Las filas se cargan por páginas de FILAS_POR_PAGINA: al actualizar solo
+    llega la primera, y la vista pide las siguientes (canFetchMore/fetchMore)
+    cuando el usuario se desplaza hasta el final de lo cargado.
+    """
+    
+    # Encabezados de las columnas de la tabla
+    ENCABEZADOS = [
+        "Placa", "Tipo", "Fecha Entrada", "Hora Entrada", 
+        "Fecha Salida", "Hora Salida", "Duración (h)", "Valor"
+    ]
+    
+    def __init__(self, parent=None):
+        """
+        Inicializa el modelo sin filas.
+        
+        Args:
+            parent (QObject, optional): Objeto padre del modelo
+        """
+        super().__init__(parent)
+        self._filas = []
+        self._textos = []
+        # Filtros de la consulta mostrada y total de registros que la cumplen
+        self._filtros = None
+        self._total = 0
+        # Las páginas siguientes se consultan en segundo plano: _pagina es la
+        # etiqueta (versión del contenido, desde qué fila) de la que está en
+        # camino, o None si no hay ninguna. La versión cambia cada vez que
+        # cambian las filas ya cargadas, y así se descartan páginas viejas
+        self._version = 0
+        self._pagina = None
+    
+    @staticmethod
+    def consultar(filtros):
+        """
+        Consulta el total de registros y la primera página del historial.
+        
+        Se ejecuta en un hilo de trabajo; su resultado se entrega tal cual a
+        actualizar().
+        
+        Args:
+            filtros (tuple): (filtro_placa, filtro_tipo, fecha_inicio, fecha_fin)
+        
+        Returns:
+            tuple: (filtros, total, filas de la primera página)
+        """
+        total = db.contar_historial(*filtros)
+        filas = db.obtener_historial(*filtros, FILAS_POR_PAGINA, 0)
+        return filtros, total, filas
+    
+    def actualizar(self, filtros, total, filas):
+        """
+        Reemplaza el contenido del modelo y avisa a la vista de lo que cambió.
+        
+        El historial se muestra del registro más reciente al más antiguo, así
+        que con los mismos filtros las salidas registradas después aparecen al
+        inicio y el resto queda igual. En ese caso solo se insertan las filas
+        nuevas (el total dice cuántas son), y si nada cambió no se hace nada;
+        la vista conserva la selección, la posición de desplazamiento y las
+        páginas ya cargadas. Cualquier otro cambio (por ejemplo, otros filtros)
+        reemplaza el contenido completo.
+        
+        Args:
+            filtros (tuple): Filtros con que se hizo la consulta
+            total (int): Cantidad de registros que cumplen los filtros
+            filas (list): Primera página retornada por db.obtener_historial()
+        """
+        nuevas = total - self._total
+        conservadas = len(filas) - nuevas
+        if (filtros == self._filtros and nuevas >= 0 and conservadas > 0
+                and filas[nuevas:] == self._filas[:conservadas]):
+            if nuevas:
+                self.beginInsertRows(QModelIndex(), 0, nuevas - 1)
+                self._filas[:0] = filas[:nuevas]
+                self._textos[:0] = [None] * nuevas
+                self._total = total
+                self._version += 1
+                self._pagina = None
+                self.endInsertRows()
+            return
+        
+        self.beginResetModel()
+        self._version += 1
+        self._pagina = None
+        self._filtros = filtros
+        self._total = total
+        self._filas = filas
+        self._textos = [None] * len(filas)
+        self.endResetModel()
+    
+    def total_registros(self):
+        """Retorna la cantidad de registros que cumplen los filtros (cargados o no)."""
+        return self._total
+    
+    def canFetchMore(self, parent):
+        """Indica si quedan páginas del historial por cargar."""
+        return (not parent.isValid() and self._pagina is None
+                and len(self._filas) < self._total)
+    
+    def fetchMore(self, parent):
+        """
+        Pide la siguiente página del historial en un hilo de trabajo.
+        
+        Las filas se agregan en agregar_pagina cuando llega el resultado;
+        mientras tanto canFetchMore retorna False para no pedirla dos veces.
+        """
+        if parent.isValid() or self._pagina is not None:
+            return
+        
+        self._pagina = (self._version, len(self._filas))
+        tarea = TareaBD(
+            self._pagina, db.obtener_historial,
+            *self._filtros, FILAS_POR_PAGINA, len(self._filas)
+        )
+        tarea.senales.terminado.connect(self.agregar_pagina)
+        QThreadPool.globalInstance().start(tarea)
+    
+    def agregar_pagina(self, pagina, filas):
+        """
+        Agrega al final de la tabla una página recibida del hilo de trabajo.
+        
+        Args:
+            pagina (tuple): Etiqueta (versión, desde qué fila) de la página
+            filas (list): Filas retornadas por db.obtener_historial(), o la
+                excepción si la consulta falló
+        """
+        # Si el contenido cambió desde que se pidió, la página ya no sirve
+        if pagina != self._pagina:
+            return
+        self._pagina = None
+        
+        # Si la consulta falló, la página se vuelve a pedir al desplazarse
+        if isinstance(filas, Exception):
+            return
+        
+        if not filas:
+            # El historial cambió desde que se contó; no hay más por cargar
+            self._total = len(self._filas)
+            return
+        
+        inicio = len(self._filas)
+        self.beginInsertRows(QModelIndex(), inicio, inicio + len(filas) - 1)
+        self._filas.extend(filas)
+        self._textos.extend([None] * len(filas))
+        self.endInsertRows()
+    
+    def rowCount(self, parent=QModelIndex()):
+        """Retorna el número de filas (el modelo es una tabla plana, sin hijos)."""
+        return 0 if parent.isValid() else len(self._filas)
+    
+    def columnCount(self, parent=QModelIndex()):
+        """Retorna el número de columnas de la tabla."""
+        return 0 if parent.isValid() else len(self.ENCABEZADOS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """Retorna el texto de los encabezados de columna."""
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.ENCABEZADOS[section]
+        return super().headerData(section, orientation, role)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        """
+        Retorna el contenido de una celda para el rol pedido por la vista.
+        
+        Args:
+            index (QModelIndex): Celda consultada
+            role (int): Rol de Qt (texto a mostrar, alineación, etc.)
+        
+        Returns:
+            El texto de la celda, su alineación o None si el rol no aplica
+        """
+        if role == Qt.DisplayRole:
+            # La vista vuelve a pedir las mismas celdas en cada repintado (al
+            # desplazarse, al pasar el mouse, al cambiar la selección), así que
+            # los textos de cada fila se arman una sola vez, la primera vez que
+            # se muestra, y se guardan para los repintados siguientes
+            fila = index.row()
+            textos = self._textos[fila]
+            if textos is None:
+                textos = self._textos[fila] = self._formatear(self._filas[fila])
+            return textos[index.column()]
+        
+        # Formato para el valor (alineado a la derecha)
+        if role == Qt.TextAlignmentRole and index.column() == 7:
+            return Qt.AlignRight | Qt.AlignVCenter
+        
+        return None
+    
+    @staticmethod
+    def _formatear(fila):
+        """
+        Arma los textos de las 8 columnas de una fila del historial.
+        
+        Args:
+            fila (tuple): Fila retornada por db.obtener_historial()
+        
+        Returns:
+            tuple: Texto de cada columna, en el orden de ENCABEZADOS
+        """
+        # Extraemos los datos del registro
+        placa, tipo, fecha_entrada, hora_entrada, minuto_entrada, \
+        fecha_salida, hora_salida, minuto_salida, duracion, valor = fila
+        
+        return (
+            placa,
+            tipo,
+            fecha_entrada,
+            f"{hora_entrada}:{minuto_entrada:02d}",
+            fecha_salida if fecha_salida else "N/A",
+            f"{hora_salida}:{minuto_salida:02d}" if fecha_salida else "N/A",
+            f"{duracion:.2f}",
+            f"${valor:,.0f}",
+        )
+
 class ParkingApp(QMainWindow):
     """
     Clase principal de la aplicación de parqueadero.
@@ -35,6 +508,10 @@ class ParkingApp(QMainWindow):
     todas las interacciones con el usuario a través de la interfaz gráfica.
     """
     
+    # Fuente de los títulos de las pestañas, compartida por todos ellos
+    # (se crea al construir el primer título: QFont necesita la QApplication)
+    _fuente_titulo = None
+    
     def __init__(self):
         """
         Inicializa la ventana principal y configura la interfaz.
@@ -42,6 +519,31 @@ class ParkingApp(QMainWindow):
         # Llamamos al constructor de la clase padre (QMainWindow)
         super().__init__()
         
+        # Número de la última consulta pedida para cada tabla; las respuestas
+        # de consultas anteriores que lleguen tarde se descartan
+        self._consulta_activos = 0
+        self._consulta_historial = 0
+        
+        # Temporizador de un solo disparo para agrupar recargas del historial:
+        # varias salidas seguidas producen una sola consulta
+        self.timer_historial = QTimer(self)
+        self.timer_historial.setSingleShot(True)
+        self.timer_historial.setInterval(100)
+        self.timer_historial.timeout.connect(self.cargar_historial)
+        
+        # Placas de los vehículos activos, para validar la placa de salida sin
+        # consultar la base de datos en cada tecla (None: hay que recargarlas)
+        self._placas_activas = None
+        
+        # La placa de salida se valida cuando el usuario deja de escribir
+        self.timer_validacion_salida = QTimer(self)
+        self.timer_validacion_salida.setSingleShot(True)
+        self.timer_validacion_salida.setInterval(250)
+        self.timer_validacion_salida.timeout.connect(self.comprobar_placa_salida)
+        
+        # Huella de los datos en el último refresco automático (ver actualizar_datos)
+        self._huella_datos = None
+        
         # Configurar la interfaz principal
         self.setup_ui()
         
@@ -90,23 +592,86 @@ class ParkingApp(QMainWindow):
         self.crear_tab_ingreso()    # Pestaña para registrar ingresos
         self.crear_tab_salida()     # Pestaña para registrar salidas
         self.crear_tab_activos()    # Pestaña para ver vehículos actualmente en el parqueadero
-        self.crear_tab_historial()  # Pestaña para consultar el historial
+        
+        # Pestaña para consultar el historial: por ahora solo se reserva su lugar;
+        # los filtros y la tabla se crean la primera vez que se abre la pestaña
+        self.tab_historial = QWidget()
+        self.tabs.addTab(self.tab_historial, "Historial")
+        self._historial_construido = False
+        # Indica que el historial cambió mientras su pestaña no estaba visible
+        self._historial_sucio = False
+        self.tabs.currentChanged.connect(self.cambio_de_pestana)
         
         # Cargar datos iniciales
         self.actualizar_datos()
     
+    def cambio_de_pestana(self, indice):
+        """
+        Prepara la pestaña de historial cuando se selecciona.
+        
+        La primera vez construye la pestaña; después solo recarga la tabla
+        si el historial cambió mientras la pestaña no estaba visible.
+        
+        Args:
+            indice (int): Posición de la pestaña seleccionada
+        """
+        if indice != PESTANA_HISTORIAL:
+            return
+        
+        if not self._historial_construido:
+            self.crear_tab_historial()
+            self._historial_construido = True
+            self.cargar_historial()
+        elif self._historial_sucio:
+            self.cargar_historial()
+    
+    def changeEvent(self, event):
+        """
+        Pausa la actualización automática mientras la ventana no está activa.
+        
+        Al volver a la ventana se reanuda el temporizador y se actualizan los
+        datos de inmediato, por si cambiaron mientras tanto.
+        
+        Args:
+            event (QEvent): Evento de cambio de estado de la ventana
+        """
+        if event.type() == QEvent.ActivationChange:
+            if self.isActiveWindow():
+                self.timer.start()
+                self.actualizar_datos()
+            else:
+                self.timer.stop()
+        super().changeEvent(event)
+    
     def actualizar_datos(self):
         """
         Actualiza todos los datos dinámicos de la interfaz.
         
         Esta función se llama periódicamente para mantener la información
-        actualizada en todas las pestañas.
+        actualizada en todas las pestañas. Antes de recargar las tablas se
+        consulta la huella de los datos; si no cambió desde la última vez
+        (no hubo ingresos ni salidas), no se hace nada.
         """
+        huella = db.obtener_huella_datos()
+        if huella is not None and huella == self._huella_datos:
+            return
+        self._huella_datos = huella
+        
         # Actualizamos la lista de vehículos activos
         self.cargar_vehiculos_activos()
         
         # Actualizamos el historial
-        self.cargar_historial()
+        self.programar_historial()
+    
+    def programar_historial(self):
+        """
+        Programa una recarga del historial.
+        
+        Cada llamada reinicia el temporizador, así que una ráfaga de cambios
+        (por ejemplo, varias salidas registradas seguidas) termina en una sola
+        llamada a cargar_historial 100 ms después del último cambio.
+        """
+        self.timer_historial.start()
     
     def crear_tab_ingreso(self):
         """
@@ -121,13 +686,7 @@ class ParkingApp(QMainWindow):
         layout = QVBoxLayout(tab)
         
         # Título de la pestaña
-        titulo = QLabel("Registro de Ingreso de Vehículos")
-        titulo.setAlignment(Qt.AlignCenter)  # Centrar el texto
-        titulo_font = QFont()
-        titulo_font.setPointSize(14)  # Tamaño de fuente
-        titulo_font.setBold(True)     # Negrita
-        titulo.setFont(titulo_font)
-        layout.addWidget(titulo)
+        layout.addWidget(self.crear_titulo("Registro de Ingreso de Vehículos"))
         
         # Formulario en un GroupBox para mejor organización visual
         form_group = QGroupBox("Datos del Vehículo")
@@ -138,9 +697,12 @@ class ParkingApp(QMainWindow):
         self.placa_ingreso.setPlaceholderText("Ej: ABC123")  # Texto de ayuda
         
         # Validador para formato de placa (3 letras seguidas de 2 o 3 números)
-        rx = QRegExp("[A-Za-z]{3}[0-9]{2,3}")
-        validator = QRegExpValidator(rx)
-        self.placa_ingreso.setValidator(validator)
+        self.placa_ingreso.setValidator(VALIDADOR_PLACA)
+        
+        # Convertimos la placa a mayúsculas mientras se escribe
+        self.placa_ingreso.textEdited.connect(
+            lambda texto: self.placa_en_mayusculas(self.placa_ingreso, texto)
+        )
         
         # Conectamos el evento de cambio de texto para validación en tiempo real
         self.placa_ingreso.textChanged.connect(self.validar_placa_ingreso)
@@ -191,6 +753,27 @@ class ParkingApp(QMainWindow):
         # Añadimos un espacio flexible al final para mejor distribución de elementos
         layout.addStretch()
     
+    def crear_titulo(self, texto):
+        """
+        Crea la etiqueta de título de una pestaña.
+        
+        Args:
+            texto (str): Texto del título
+        
+        Returns:
+            QLabel: Etiqueta centrada con la fuente de títulos (14 puntos, negrita)
+        """
+        if ParkingApp._fuente_titulo is None:
+            fuente = QFont()
+            fuente.setPointSize(14)  # Tamaño de fuente
+            fuente.setBold(True)     # Negrita
+            ParkingApp._fuente_titulo = fuente
+        
+        titulo = QLabel(texto)
+        titulo.setAlignment(Qt.AlignCenter)  # Centrar el texto
+        titulo.setFont(ParkingApp._fuente_titulo)
+        return titulo
+    
     def toggle_fecha_hora_ingreso(self):
         """
         Habilita o deshabilita los campos de fecha y hora según el checkbox.
@@ -210,6 +793,26 @@ class ParkingApp(QMainWindow):
             self.fecha_ingreso.setDate(QDate.currentDate())
             self.hora_ingreso.setTime(QTime.currentTime())
     
+    def placa_en_mayusculas(self, campo, texto):
+        """
+        Convierte a mayúsculas el texto de un campo de placa mientras se escribe.
+        
+        Se conecta a textEdited, que solo se emite cuando el usuario modifica el
+        campo (al escribir o pegar), no cuando el programa usa setText; por eso
+        el cambio de texto no vuelve a llamar a esta función. Así las placas ya
+        están normalizadas al validarlas y al registrarlas.
+        
+        Args:
+            campo (QLineEdit): Campo de placa editado
+            texto (str): Texto actual del campo
+        """
+        mayusculas = texto.upper()
+        if mayusculas != texto:
+            # Conservamos la posición del cursor para no interrumpir la escritura
+            posicion = campo.cursorPosition()
+            campo.setText(mayusculas)
+            campo.setCursorPosition(posicion)
+    
     def validar_placa_ingreso(self):
         """
         Valida el formato de la placa en tiempo real.
@@ -217,8 +820,8 @@ class ParkingApp(QMainWindow):
         Esta función cambia el color de fondo del campo de placa según
         si el formato es válido (verde) o inválido (rojo).
         """
-        # Obtenemos el texto de la placa, eliminamos espacios y convertimos a mayúsculas
-        placa = self.placa_ingreso.text().strip().upper()
+        # Obtenemos el texto de la placa (ya en mayúsculas) y eliminamos espacios
+        placa = self.placa_ingreso.text().strip()
         
         if placa:
             # Validamos el formato usando la función del módulo de base de datos
@@ -243,13 +846,7 @@ class ParkingApp(QMainWindow):
         layout = QVBoxLayout(tab)
         
         # Título de la pestaña
-        titulo = QLabel("Registro de Salida de Vehículos")
-        titulo.setAlignment(Qt.AlignCenter)  # Centrar el texto
-        titulo_font = QFont()
-        titulo_font.setPointSize(14)  # Tamaño de fuente
-        titulo_font.setBold(True)     # Negrita
-        titulo.setFont(titulo_font)
-        layout.addWidget(titulo)
+        layout.addWidget(self.crear_titulo("Registro de Salida de Vehículos"))
         
         # Formulario en un GroupBox para mejor organización visual
         form_group = QGroupBox("Datos de Salida")
@@ -259,6 +856,11 @@ class ParkingApp(QMainWindow):
         self.placa_salida = QLineEdit()
         self.placa_salida.setPlaceholderText("Ej: ABC123")  # Texto de ayuda
         
+        # Convertimos la placa a mayúsculas mientras se escribe
+        self.placa_salida.textEdited.connect(
+            lambda texto: self.placa_en_mayusculas(self.placa_salida, texto)
+        )
+        
         # Conectamos el evento de cambio de texto para validación en tiempo real
         self.placa_salida.textChanged.connect(self.validar_placa_salida)
         form_layout.addRow("Placa:", self.placa_salida)
@@ -323,21 +925,37 @@ class ParkingApp(QMainWindow):
             self.hora_salida.setTime(QTime.currentTime())
     
     def validar_placa_salida(self):
+        """
+        Programa la validación de la placa de salida.
+        
+        Se llama en cada cambio del texto; la comprobación se hace en
+        comprobar_placa_salida 250 ms después de la última tecla, así que una
+        placa escrita de corrido se valida una sola vez.
+        """
+        if self.placa_salida.text().strip():
+            self.timer_validacion_salida.start()
+        else:
+            # Si el campo está vacío, restauramos el estilo por defecto
+            self.timer_validacion_salida.stop()
+            self.placa_salida.setStyleSheet("")
+    
+    def comprobar_placa_salida(self):
         """
         Valida si la placa existe en vehículos activos.
         
         Esta función cambia el color de fondo del campo de placa según
         si la placa existe en el parqueadero (verde) o no (rojo).
         """
-        # Obtenemos el texto de la placa, eliminamos espacios y convertimos a mayúsculas
-        placa = self.placa_salida.text().strip().upper()
+        # Obtenemos el texto de la placa (ya en mayúsculas) y eliminamos espacios
+        placa = self.placa_salida.text().strip()
         
         if placa:
-            # Verificar si la placa está en vehículos activos
-            vehiculos = db.obtener_vehiculos_activos()
-            placas_activas = [v[0] for v in vehiculos]  # Extraemos solo las placas
+            # Verificar si la placa está en vehículos activos; las placas se
+            # consultan solo si no hay una lista vigente
+            if self._placas_activas is None:
+                self._placas_activas = {v[0] for v in db.obtener_vehiculos_activos()}
             
-            if placa in placas_activas:
+            if placa in self._placas_activas:
                 self.placa_salida.setStyleSheet("background-color: #c8e6c9;")  # Verde claro
             else:
                 self.placa_salida.setStyleSheet("background-color: #ffcdd2;")  # Rojo claro
@@ -358,25 +976,23 @@ class ParkingApp(QMainWindow):
         layout = QVBoxLayout(tab)
         
         # Título de la pestaña
-        titulo = QLabel("Vehículos Actualmente en el Parqueadero")
-        titulo.setAlignment(Qt.AlignCenter)  # Centrar el texto
-        titulo_font = QFont()
-        titulo_font.setPointSize(14)  # Tamaño de fuente
-        titulo_font.setBold(True)     # Negrita
-        titulo.setFont(titulo_font)
-        layout.addWidget(titulo)
-        
-        # Tabla de vehículos activos
-        self.tabla_activos = QTableWidget()
-        self.tabla_activos.setColumnCount(5)  # 5 columnas
-        self.tabla_activos.setHorizontalHeaderLabels([
-            "Placa", "Tipo", "Fecha Entrada", "Hora Entrada", "Acciones"
-        ])
+        layout.addWidget(self.crear_titulo("Vehículos Actualmente en el Parqueadero"))
+        
+        # Tabla de vehículos activos (vista sobre un modelo: las celdas se
+        # arman al mostrarse, sin crear un QTableWidgetItem por cada una)
+        self.modelo_activos = ActivosModel(self)
+        self.tabla_activos = QTableView()
+        self.tabla_activos.setModel(self.modelo_activos)
         
         # Configuración de la tabla
         self.tabla_activos.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)  # Ajustar ancho de columnas
-        self.tabla_activos.setEditTriggers(QTableWidget.NoEditTriggers)  # No permitir edición directa
-        self.tabla_activos.setSelectionBehavior(QTableWidget.SelectRows)  # Seleccionar filas completas
+        self.tabla_activos.setEditTriggers(QAbstractItemView.NoEditTriggers)  # No permitir edición directa
+        self.tabla_activos.setSelectionBehavior(QAbstractItemView.SelectRows)  # Seleccionar filas completas
+        
+        # Botón de registrar salida en cada fila, dibujado por un delegado
+        self.delegado_salida = BotonSalidaDelegate(self.tabla_activos)
+        self.delegado_salida.salida_pedida.connect(self.registrar_salida_rapida)
+        self.tabla_activos.setItemDelegateForColumn(ActivosModel.COLUMNA_ACCIONES, self.delegado_salida)
         layout.addWidget(self.tabla_activos)
         
         # Botones
@@ -393,38 +1009,48 @@ class ParkingApp(QMainWindow):
         """
         Carga la lista de vehículos actualmente en el parqueadero.
         
-        Esta función actualiza la tabla de vehículos activos con los datos
-        más recientes de la base de datos.
+        Esta función pide los datos más recientes de la base de datos en un
+        hilo de trabajo; la tabla se actualiza en mostrar_vehiculos_activos
+        cuando llega el resultado.
+        
+        Se llama después de cada ingreso o salida, así que aquí también se
+        descarta la lista de placas activas usada para validar la salida.
+        """
+        self._placas_activas = None
+        self._consulta_activos += 1
+        tarea = TareaBD(self._consulta_activos, db.obtener_vehiculos_activos)
+        tarea.senales.terminado.connect(self.mostrar_vehiculos_activos)
+        QThreadPool.globalInstance().start(tarea)
+    
+    def mostrar_vehiculos_activos(self, consulta, vehiculos):
+        """
+        Muestra en la tabla la lista de vehículos activos recibida.
+        
+        Args:
+            consulta (int): Número de la consulta que produjo el resultado
+            vehiculos (list): Lista de tuplas retornada por db.obtener_vehiculos_activos(),
+                o la excepción si la consulta falló
         """
-        # Limpiamos la tabla actual
-        self.tabla_activos.setRowCount(0)
+        # Si ya se pidió una consulta más reciente, este resultado está desactualizado
+        if consulta != self._consulta_activos:
+            return
         
-        # Obtenemos la lista de vehículos activos
-        vehiculos = db.obtener_vehiculos_activos()
+        # Si la consulta falló, conservamos la tabla actual y lo avisamos
+        if isinstance(vehiculos, Exception):
+            self.statusBar.showMessage(f"Error al consultar vehículos activos: {vehiculos}")
+            return
         
-        # Añadimos cada vehículo a la tabla
-        for fila in vehiculos:
-            # Añadimos una nueva fila a la tabla
-            row_position = self.tabla_activos.rowCount()
-            self.tabla_activos.insertRow(row_position)
-            
-            # Extraemos los datos del vehículo
-            placa, tipo, fecha_entrada, hora_entrada, minuto_entrada = fila
-            
-            # Añadimos los datos a las celdas correspondientes
-            self.tabla_activos.setItem(row_position, 0, QTableWidgetItem(placa))
-            self.tabla_activos.setItem(row_position, 1, QTableWidgetItem(tipo))
-            self.tabla_activos.setItem(row_position, 2, QTableWidgetItem(fecha_entrada))
-            self.tabla_activos.setItem(row_position, 3, QTableWidgetItem(f"{hora_entrada}:{minuto_entrada:02d}"))
-            
-            # Botón de registrar salida para cada vehículo
-            btn_salida = QPushButton("Registrar Salida")
-            # Usamos lambda con un parámetro adicional para capturar la placa específica
-            btn_salida.clicked.connect(lambda checked, p=placa: self.registrar_salida_rapida(p))
-            self.tabla_activos.setCellWidget(row_position, 4, btn_salida)
+        # Entregamos las filas al modelo
+        self.modelo_activos.actualizar(vehiculos)
+        
+        # Renovamos las placas activas y, si hay una placa de salida escrita,
+        # volvemos a validarla con los datos nuevos
+        self._placas_activas = {fila[0] for fila in vehiculos}
+        if self.placa_salida.text().strip():
+            self.comprobar_placa_salida()
         
         # Actualizar contador en la pestaña
-        self.tabs.setTabText(2, f"Vehículos Activos ({self.tabla_activos.rowCount()})")
+        self.tabs.setTabText(2, f"Vehículos Activos ({self.modelo_activos.rowCount()})")
     
     def registrar_salida_rapida(self, placa):
         """
@@ -471,30 +1097,24 @@ class ParkingApp(QMainWindow):
                 )
                 # Actualizamos las tablas
                 self.cargar_vehiculos_activos()
-                self.cargar_historial()
+                self.programar_historial()
             else:
                 QMessageBox.critical(self, "Error", result)
     
     def crear_tab_historial(self):
         """
-        Crea la pestaña de historial de vehículos.
+        Crea el contenido de la pestaña de historial de vehículos.
         
         Esta pestaña muestra una tabla con el historial de todos los vehículos
         que han usado el parqueadero, con opciones de filtrado y exportación.
+        Se llama desde cambio_de_pestana, la primera vez que se abre la pestaña,
+        para no crear sus widgets al iniciar la aplicación.
         """
-        # Creamos un widget para la pestaña y lo añadimos al sistema de pestañas
-        tab = QWidget()
-        self.tabs.addTab(tab, "Historial")
-        layout = QVBoxLayout(tab)
+        # Usamos el widget reservado para la pestaña en setup_ui
+        layout = QVBoxLayout(self.tab_historial)
         
         # Título de la pestaña
-        titulo = QLabel("Historial de Vehículos")
-        titulo.setAlignment(Qt.AlignCenter)  # Centrar el texto
-        titulo_font = QFont()
-        titulo_font.setPointSize(14)  # Tamaño de fuente
-        titulo_font.setBold(True)     # Negrita
-        titulo.setFont(titulo_font)
-        layout.addWidget(titulo)
+        layout.addWidget(self.crear_titulo("Historial de Vehículos"))
         
         # Filtros en un GroupBox para mejor organización visual
         filtros_group = QGroupBox("Filtros")
@@ -560,75 +1180,81 @@ class ParkingApp(QMainWindow):
         filtros_group.setLayout(filtros_layout)
         layout.addWidget(filtros_group)
         
-        # Tabla de historial
-        self.tabla_historial = QTableWidget()
-        self.tabla_historial.setColumnCount(8)  # 8 columnas
-        self.tabla_historial.setHorizontalHeaderLabels([
-            "Placa", "Tipo", "Fecha Entrada", "Hora Entrada", 
-            "Fecha Salida", "Hora Salida", "Duración (h)", "Valor"
-        ])
+        # Tabla de historial: una vista sobre HistorialModel, que arma el texto
+        # de las celdas a medida que se muestran
+        self.modelo_historial = HistorialModel(self)
+        self.tabla_historial = QTableView()
+        self.tabla_historial.setModel(self.modelo_historial)
         
         # Configuración de la tabla
         self.tabla_historial.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)  # Ajustar ancho de columnas
-        self.tabla_historial.setEditTriggers(QTableWidget.NoEditTriggers)  # No permitir edición directa
-        self.tabla_historial.setSelectionBehavior(QTableWidget.SelectRows)  # Seleccionar filas completas
+        self.tabla_historial.setEditTriggers(QAbstractItemView.NoEditTriggers)  # No permitir edición directa
+        self.tabla_historial.setSelectionBehavior(QAbstractItemView.SelectRows)  # Seleccionar filas completas
         layout.addWidget(self.tabla_historial)
     
     def cargar_historial(self):
         """
         Carga el historial de vehículos con los filtros aplicados.
         
-        Esta función actualiza la tabla de historial con los datos filtrados
-        según los criterios especificados por el usuario.
+        Esta función lee los criterios especificados por el usuario y pide
+        el historial filtrado en un hilo de trabajo; la tabla se actualiza en
+        mostrar_historial cuando llega el resultado.
+        
+        Si la pestaña aún no se ha abierto no hay nada que actualizar: el
+        historial se carga al construirla. Si está construida pero no es la
+        pestaña visible, solo se marca como pendiente y se recarga cuando el
+        usuario vuelva a ella.
         """
-        # Limpiamos la tabla actual
-        self.tabla_historial.setRowCount(0)
+        if not self._historial_construido:
+            return
         
-        # Obtener valores de filtros
-        # Verificamos que los widgets existan antes de acceder a ellos
-        filtro_placa = self.filtro_placa.text().strip() if hasattr(self, 'filtro_placa') else None
+        if self.tabs.currentIndex() != PESTANA_HISTORIAL:
+            self._historial_sucio = True
+            return
+        self._historial_sucio = False
         
-        filtro_tipo = None
-        if hasattr(self, 'filtro_tipo') and self.filtro_tipo.currentText() != "Todos":
-            filtro_tipo = self.filtro_tipo.currentText()
+        # Obtener valores de filtros (los widgets existen: la pestaña ya está construida)
+        filtro_placa = self.filtro_placa.text().strip()
         
-        fecha_inicio = None
-        if hasattr(self, 'filtro_fecha_inicio'):
-            fecha_inicio = self.filtro_fecha_inicio.date().toString("yyyy-MM-dd")
+        filtro_tipo = self.filtro_tipo.currentText()
+        if filtro_tipo == "Todos":
+            filtro_tipo = None
         
-        fecha_fin = None
-        if hasattr(self, 'filtro_fecha_fin'):
-            fecha_fin = self.filtro_fecha_fin.date().toString("yyyy-MM-dd")
+        fecha_inicio = self.filtro_fecha_inicio.date().toString("yyyy-MM-dd")
+        fecha_fin = self.filtro_fecha_fin.date().toString("yyyy-MM-dd")
         
-        # Obtener historial filtrado
-        historial = db.obtener_historial(filtro_placa, filtro_tipo, fecha_inicio, fecha_fin)
+        # Obtener historial filtrado (en segundo plano): el total y la primera página
+        self._consulta_historial += 1
+        tarea = TareaBD(
+            self._consulta_historial, HistorialModel.consultar,
+            (filtro_placa, filtro_tipo, fecha_inicio, fecha_fin)
+        )
+        tarea.senales.terminado.connect(self.mostrar_historial)
+        QThreadPool.globalInstance().start(tarea)
+    
+    def mostrar_historial(self, consulta, resultado):
+        """
+        Muestra en la tabla el historial filtrado recibido.
         
-        # Añadimos cada registro a la tabla
-        for fila in historial:
-            # Añadimos una nueva fila a la tabla
-            row_position = self.tabla_historial.rowCount()
-            self.tabla_historial.insertRow(row_position)
-            
-            # Extraemos los datos del registro
-            placa, tipo, fecha_entrada, hora_entrada, minuto_entrada, \
-            fecha_salida, hora_salida, minuto_salida, duracion, valor = fila
-            
-            # Añadimos los datos a las celdas correspondientes
-            self.tabla_historial.setItem(row_position, 0, QTableWidgetItem(placa))
-            self.tabla_historial.setItem(row_position, 1, QTableWidgetItem(tipo))
-            self.tabla_historial.setItem(row_position, 2, QTableWidgetItem(fecha_entrada))
-            self.tabla_historial.setItem(row_position, 3, QTableWidgetItem(f"{hora_entrada}:{minuto_entrada:02d}"))
-            self.tabla_historial.setItem(row_position, 4, QTableWidgetItem(fecha_salida if fecha_salida else "N/A"))
-            self.tabla_historial.setItem(row_position, 5, QTableWidgetItem(f"{hora_salida}:{minuto_salida:02d}" if fecha_salida else "N/A"))
-            self.tabla_historial.setItem(row_position, 6, QTableWidgetItem(f"{duracion:.2f}"))
-            
-            # Formato para el valor (alineado a la derecha)
-            valor_item = QTableWidgetItem(f"${valor:,.0f}")
-            valor_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.tabla_historial.setItem(row_position, 7, valor_item)
+        Args:
+            consulta (int): Número de la consulta que produjo el resultado
+            resultado (tuple): (filtros, total, primera página) retornado por
+                HistorialModel.consultar(), o la excepción si la consulta falló
+        """
+        # Si ya se pidió una consulta más reciente, este resultado está desactualizado
+        if consulta != self._consulta_historial:
+            return
         
-        # Actualizar contador en la pestaña
-        self.tabs.setTabText(3, f"Historial ({self.tabla_historial.rowCount()})")
+        # Si la consulta falló, conservamos la tabla actual y lo avisamos
+        if isinstance(resultado, Exception):
+            self.statusBar.showMessage(f"Error al consultar el historial: {resultado}")
+            return
+        
+        # Entregamos las filas al modelo; la vista solo formatea las visibles
+        self.modelo_historial.actualizar(*resultado)
+        
+        # Actualizar contador en la pestaña (total de registros, no solo los cargados)
+        self.tabs.setTabText(PESTANA_HISTORIAL, f"Historial ({self.modelo_historial.total_registros()})")
     
     def exportar_historial(self, formato):
         """
@@ -656,36 +1282,77 @@ class ParkingApp(QMainWindow):
             file_path, _ = QFileDialog.getSaveFileName(
                 self, "Exportar CSV", "historial_parqueadero.csv", "CSV Files (*.csv)"
             )
-            
-            if file_path:
-                # Llamar a la función de exportación
-                success, message = db.exportar_historial_csv(
-                    file_path, filtro_placa, filtro_tipo, fecha_inicio, fecha_fin
-                )
-                
-                # Mostrar resultado
-                if success:
-                    QMessageBox.information(self, "Éxito", message)
-                else:
-                    QMessageBox.critical(self, "Error", message)
+            funcion = db.exportar_historial_csv
         
         elif formato == "excel":
             # Mostrar diálogo para seleccionar ubicación del archivo
             file_path, _ = QFileDialog.getSaveFileName(
                 self, "Exportar Excel", "historial_parqueadero.xlsx", "Excel Files (*.xlsx)"
             )
+            funcion = db.exportar_historial_excel
+        
+        else:
+            return
+        
+        if file_path:
+            # Exportamos en segundo plano para que la ventana siga respondiendo;
+            # el avance se muestra en la barra de estado
+            tarea = TareaBD(
+                formato, funcion,
+                file_path, filtro_placa, filtro_tipo, fecha_inicio, fecha_fin
+            )
+            tarea.kwargs["progreso"] = tarea.senales.progreso.emit
+            tarea.senales.progreso.connect(self.mostrar_progreso_exportacion)
+            tarea.senales.terminado.connect(self.exportacion_terminada)
             
-            if file_path:
-                # Llamar a la función de exportación
-                success, message = db.exportar_historial_excel(
-                    file_path, filtro_placa, filtro_tipo, fecha_inicio, fecha_fin
-                )
-                
-                # Mostrar resultado
-                if success:
-                    QMessageBox.information(self, "Éxito", message)
-                else:
-                    QMessageBox.critical(self, "Error", message)
+            # Evitamos iniciar otra exportación del mismo formato mientras esta no termine
+            self.boton_exportacion(formato).setEnabled(False)
+            self.statusBar.showMessage("Exportando historial...")
+            QThreadPool.globalInstance().start(tarea)
+    
+    def boton_exportacion(self, formato):
+        """
+        Retorna el botón que inicia la exportación en un formato.
+        
+        Args:
+            formato (str): Formato de exportación ('csv' o 'excel')
+        
+        Returns:
+            QPushButton: Botón de exportación correspondiente
+        """
+        return self.btn_exportar_csv if formato == "csv" else self.btn_exportar_excel
+    
+    def mostrar_progreso_exportacion(self, filas):
+        """
+        Muestra en la barra de estado cuántas filas se han exportado.
+        
+        Args:
+            filas (int): Filas escritas hasta el momento
+        """
+        self.statusBar.showMessage(f"Exportando historial... {filas} registros")
+    
+    def exportacion_terminada(self, formato, resultado):
+        """
+        Muestra el resultado de una exportación hecha en segundo plano.
+        
+        Args:
+            formato (str): Formato exportado ('csv' o 'excel')
+            resultado (tuple): (success, message) retornado por la exportación,
+                o la excepción si la exportación falló
+        """
+        if isinstance(resultado, Exception):
+            resultado = (False, f"Error al exportar: {resultado}")
+        success, message = resultado
+        
+        # Habilitamos de nuevo el botón y restauramos la barra de estado
+        self.boton_exportacion(formato).setEnabled(True)
+        self.statusBar.showMessage("Sistema de Parqueadero")
+        
+        # Mostrar resultado
+        if success:
+            QMessageBox.information(self, "Éxito", message)
+        else:
+            QMessageBox.critical(self, "Error", message)
     
     def registrar_ingreso_ui(self):
         """
@@ -787,7 +1454,7 @@ class ParkingApp(QMainWindow):
                 self.placa_salida.clear()
                 # Actualizar tablas
                 self.cargar_vehiculos_activos()
-                self.cargar_historial()
+                self.programar_historial()
             else:
                 QMessageBox.critical(self, "Error", result)
 
@@ -6,15 +6,43 @@
 
 # Importación de módulos necesarios
 import sys  # Módulo para interactuar con el sistema operativo
-from PyQt5.QtWidgets import QApplication  # Clase principal para aplicaciones PyQt5
+import sqlite3  # Para reconocer los errores al abrir la base de datos
+import queue  # Cola donde se depositan los mensajes de registro
+import logging  # Módulo para el registro de eventos y errores
+from logging.handlers import QueueHandler, QueueListener  # Registro sin bloquear al hilo que lo emite
+from PyQt5.QtWidgets import QApplication, QMessageBox  # Clase principal para aplicaciones PyQt5 y cuadros de mensaje
 from gui_qt_mejorado import ParkingApp  # Importamos nuestra clase principal de la interfaz gráfica
+import database_mejorado as db  # Módulo de base de datos
 
 # Punto de entrada principal de la aplicación
 if __name__ == "__main__":
+    # Configuramos el registro de eventos: los módulos solo depositan los mensajes
+    # en una cola y un hilo aparte los escribe en la consola, de modo que un error
+    # nunca detiene una operación de base de datos mientras se escribe en pantalla
+    cola_registro = queue.SimpleQueue()
+    consola = logging.StreamHandler()
+    consola.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    oyente = QueueListener(cola_registro, consola)
+    logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(cola_registro)])
+    oyente.start()
+    
     # Creamos una instancia de QApplication con los argumentos del sistema
     # QApplication gestiona el flujo de control y configuración principal de la aplicación GUI
     app = QApplication(sys.argv)
     
+    # Abrimos la base de datos antes de crear la ventana: la conexión (y el
+    # esquema) quedan listos para las primeras consultas de la interfaz. Una
+    # base del formato antiguo se convierte aquí mismo
+    try:
+        db.conectar()
+        db.migrar_datos_antiguos()
+    except (sqlite3.Error, OSError) as e:
+        # Sin base de datos la aplicación no puede funcionar: avisamos y salimos
+        logging.getLogger("parking").exception("No se pudo abrir la base de datos")
+        QMessageBox.critical(None, "Error", f"No se pudo abrir la base de datos:\n\n{e}")
+        oyente.stop()
+        sys.exit(1)
+    
     # Creamos una instancia de nuestra ventana principal personalizada
     window = ParkingApp()
     
@@ -24,6 +52,10 @@ if __name__ == "__main__":
     # Iniciamos el bucle de eventos de la aplicación
     # app.exec_() inicia el bucle principal de eventos de Qt, que espera hasta que se cierre la aplicación
     # sys.exit() asegura que la aplicación se cierre correctamente con el código de salida adecuado
-    sys.exit(app.exec_())
+    codigo = app.exec_()
+    
+    # Vaciamos la cola de registro antes de salir
+    oyente.stop()
+    sys.exit(codigo)
 
 